@@ -1,3 +1,20 @@
+import numpy as np
+
+from report import print_report
+
+# Упакованный формат: MAGIC, вид символов, ширина кода, размер алфавита,
+# алфавит по возрастанию, число символов, затем коды по width бит, старший бит первым
+MAGIC = b'FLE\x01'
+KIND_BYTES = 0
+KIND_TEXT = 1
+# Байт на символ алфавита в заголовке: байт или кодовая точка Unicode (до 0x10FFFF)
+SYMBOL_SIZE = {KIND_BYTES: 1, KIND_TEXT: 3}
+# Символов за один шаг упаковки; кратно 8, чтобы куски начинались с целого байта
+PACK_CHUNK_SIZE = 1 << 20
+# До этого значения символа номера ищутся по таблице, выше - сортировкой (np.unique)
+LOOKUP_LIMIT = 1 << 16
+
+
 def fixed_length_encode(data, num_bits=8):
     encoded_msg = ''.join([format(ord(char), f'0{num_bits}b') for char in data])
     return encoded_msg
@@ -9,19 +26,127 @@ def fixed_length_decode(encoded, num_bits=8):
     return ''.join(decoded)
 
 
+def to_symbols(data):
+    """Массив символов и их вид: байты как uint8, строка - кодовые точки uint32."""
+    if isinstance(data, str):
+        return np.frombuffer(data.encode('utf-32-le'), dtype='<u4'), KIND_TEXT
+    return np.frombuffer(data, dtype=np.uint8), KIND_BYTES
+
+
+def code_width(alphabet_size):
+    """Минимальное число бит, различающее alphabet_size символов (0 для одного символа)."""
+    return max(alphabet_size - 1, 0).bit_length()
+
+
+def pack_codes(indices, width):
+    """Упаковывает номера символов по width бит в байты векторно."""
+    # Узкие коды разворачиваются в uint8: промежуточная матрица бит вчетверо меньше
+    dtype = np.uint8 if width <= 8 else np.uint32
+    shifts = np.arange(width - 1, -1, -1, dtype=dtype)
+    parts = []
+    for i in range(0, len(indices), PACK_CHUNK_SIZE):
+        chunk = indices[i:i + PACK_CHUNK_SIZE].astype(dtype)
+        bits = ((chunk[:, None] >> shifts) & 1).astype(np.uint8)
+        parts.append(np.packbits(bits.reshape(-1)).tobytes())
+    return b''.join(parts)
+
+
+def unpack_codes(packed, count, width):
+    """Обратное к pack_codes: count номеров символов."""
+    weights = (1 << np.arange(width - 1, -1, -1, dtype=np.uint32)).astype(np.uint32)
+    chunk_bytes = PACK_CHUNK_SIZE * width // 8
+    indices = np.empty(count, dtype=np.uint32)
+    for start, offset in zip(range(0, count, PACK_CHUNK_SIZE), range(0, len(packed), chunk_bytes)):
+        n = min(PACK_CHUNK_SIZE, count - start)
+        chunk = np.frombuffer(packed, dtype=np.uint8, count=(n * width + 7) // 8, offset=offset)
+        bits = np.unpackbits(chunk, count=n * width).reshape(n, width)
+        indices[start:start + n] = bits @ weights
+    return indices
+
+
+def fixed_length_compress(data):
+    """Кодирует bytes или str кодом минимальной постоянной длины.
+
+    Ширина кода определяется алфавитом, который реально встречается в данных,
+    сам алфавит хранится в заголовке.
+    """
+    symbols, kind = to_symbols(data)
+    if len(symbols) and symbols.max() < LOOKUP_LIMIT:
+        # Байты и текст из BMP: алфавит и номера дают bincount и таблица, без сортировки
+        alphabet = np.flatnonzero(np.bincount(symbols))
+        lookup = np.zeros(int(alphabet[-1]) + 1, dtype=np.uint32)
+        lookup[alphabet] = np.arange(len(alphabet), dtype=np.uint32)
+        indices = lookup[symbols]
+    else:
+        alphabet, indices = np.unique(symbols, return_inverse=True)
+    width = code_width(len(alphabet))
+    symbol_size = SYMBOL_SIZE[kind]
+    header = bytearray(MAGIC)
+    header += bytes([kind, width])
+    header += len(alphabet).to_bytes(4, 'big')
+    for symbol in alphabet.tolist():
+        header += symbol.to_bytes(symbol_size, 'big')
+    header += len(symbols).to_bytes(8, 'big')
+    if width == 0:
+        return bytes(header)
+    return bytes(header) + pack_codes(indices, width)
+
+
+def fixed_length_decompress(compressed):
+    """Восстанавливает bytes или str, переданные в fixed_length_compress."""
+    if compressed[:len(MAGIC)] != MAGIC:
+        raise ValueError("Это не данные кода постоянной длины")
+    pos = len(MAGIC)
+    if len(compressed) < pos + 6:
+        raise ValueError("Повреждённый заголовок или обрезанные данные")
+    kind, width = compressed[pos], compressed[pos + 1]
+    if kind not in SYMBOL_SIZE:
+        raise ValueError(f"Неизвестный вид символов: {kind}")
+    alphabet_size = int.from_bytes(compressed[pos + 2:pos + 6], 'big')
+    pos += 6
+    symbol_size = SYMBOL_SIZE[kind]
+    # Размер алфавита сверяется с длиной данных до выделения памяти под него
+    if len(compressed) < pos + alphabet_size * symbol_size + 8:
+        raise ValueError("Повреждённый заголовок или обрезанные данные")
+    # Символ алфавита - symbol_size байт старшим первым: строки байтов складываются сдвигами
+    columns = np.frombuffer(compressed, dtype=np.uint8, count=alphabet_size * symbol_size,
+                            offset=pos).reshape(alphabet_size, symbol_size).astype(np.uint32)
+    alphabet = np.zeros(alphabet_size, dtype=np.uint32)
+    for column in range(symbol_size):
+        alphabet = (alphabet << 8) | columns[:, column]
+    pos += alphabet_size * symbol_size
+    count = int.from_bytes(compressed[pos:pos + 8], 'big')
+    pos += 8
+    if width != code_width(alphabet_size) or len(compressed) - pos < (count * width + 7) // 8:
+        raise ValueError("Повреждённый заголовок или обрезанные данные")
+    if count and not alphabet_size:
+        raise ValueError("Повреждённый заголовок: пустой алфавит")
+    # Символы сразу в типе результата: байт занимает байт, а не четыре
+    alphabet = alphabet.astype(np.uint8 if kind == KIND_BYTES else '<u4')
+    if width:
+        symbols = alphabet[unpack_codes(memoryview(compressed)[pos:], count, width)]
+    else:
+        # Единственный символ: длина результата задана только счётчиком в заголовке
+        try:
+            symbols = np.repeat(alphabet, count)
+        except (MemoryError, OverflowError):
+            raise ValueError(f"Распакованные данные ({count} символов) не помещаются в память") from None
+    if kind == KIND_TEXT:
+        return symbols.tobytes().decode('utf-32-le')
+    return symbols.tobytes()
+
+
 if __name__ == '__main__':
-    from main import evaluate_compression
     import time
 
-    start_time = time.time()
-    # Пример использования
     with open('text.txt', 'r', encoding='utf-8') as f:
         text = f.read()
-    encoded_text = fixed_length_encode(text, num_bits=16)
-    with open('encoded_text_Fixed.txt', 'w', encoding='utf-8') as w:
-        w.write(encoded_text)
-    decoded_text = fixed_length_decode(encoded_text, num_bits=16)
+    start_time = time.perf_counter()
+    compressed = fixed_length_compress(text)
+    with open('encoded_text_Fixed.bin', 'wb') as w:
+        w.write(compressed)
+    decoded_text = fixed_length_decompress(compressed)
     with open('decoded_text_Fixed.txt', 'w', encoding='utf-8') as w:
         w.write(decoded_text)
-    end_time = time.time() - start_time
-    evaluate_compression(text, encoded_text, end_time)
+    end_time = time.perf_counter() - start_time
+    print_report(len(text.encode('utf-8')), len(compressed), end_time)
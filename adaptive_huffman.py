@@ -0,0 +1,278 @@
+import sys
+
+from haffman import CHUNK_SIZE, BitWriter
+
+# Адаптивный (однопроходный) код Хаффмана по алгоритму FGK.
+# Дерево перестраивается после каждого символа одинаково у кодера и декодера,
+# поэтому таблица кодов в поток не записывается.
+
+# Длина "сырого" значения после кода NYT: байты 0..255 и служебные маркеры
+RAW_BITS = 9
+# Маркер сброса: декодер пропускает биты до границы байта
+SYNC_MARKER = 256
+# Маркер конца потока
+END_MARKER = 257
+
+
+class AdaptiveHuffmanTree:
+    """Дерево FGK в параллельных списках.
+
+    Узлы пронумерованы позицией в списках: корень - позиция 0, веса по позициям
+    не возрастают, поэтому лидер блока (узел с наибольшим номером среди узлов
+    того же веса) - самая левая позиция с этим весом. При обмене узлов меняется
+    содержимое позиций, а связь позиция -> родитель остаётся прежней.
+    """
+
+    def __init__(self):
+        self.weight = [0]
+        self.parent = [-1]
+        self.left = [-1]
+        self.right = [-1]
+        self.symbol = [-1]
+        self.leaf = {}  # символ -> позиция листа
+        self.nyt = 0  # позиция листа "ещё не встречался" (Not Yet Transmitted)
+
+    def code(self, position):
+        """Код узла: (целое, длина) - путь от корня, старший бит первым."""
+        parent, right = self.parent, self.right
+        code = 0
+        length = 0
+        while position:
+            up = parent[position]
+            if right[up] == position:
+                code |= 1 << length
+            length += 1
+            position = up
+        return code, length
+
+    def add_symbol(self, symbol):
+        """Расщепляет NYT на новый NYT и лист символа; возвращает позицию листа."""
+        old = self.nyt
+        leaf, nyt = len(self.weight), len(self.weight) + 1
+        self.weight += [0, 0]
+        self.parent += [old, old]
+        self.left += [-1, -1]
+        self.right += [-1, -1]
+        self.symbol += [symbol, -1]
+        self.left[old] = nyt
+        self.right[old] = leaf
+        self.leaf[symbol] = leaf
+        self.nyt = nyt
+        return leaf
+
+    def _swap(self, a, b):
+        weight, left, right, symbol, parent = self.weight, self.left, self.right, self.symbol, self.parent
+        weight[a], weight[b] = weight[b], weight[a]
+        left[a], left[b] = left[b], left[a]
+        right[a], right[b] = right[b], right[a]
+        symbol[a], symbol[b] = symbol[b], symbol[a]
+        for position in (a, b):
+            if left[position] >= 0:
+                parent[left[position]] = position
+                parent[right[position]] = position
+            elif symbol[position] >= 0:
+                self.leaf[symbol[position]] = position
+            else:
+                self.nyt = position
+
+    def update(self, position):
+        """Увеличивает вес листа и его предков, сохраняя свойство братства."""
+        weight, parent = self.weight, self.parent
+        while position:
+            w = weight[position]
+            leader = position
+            while leader > 1 and weight[leader - 1] == w:
+                leader -= 1
+            if leader != position and leader != parent[position]:
+                self._swap(position, leader)
+                position = leader
+            weight[position] = w + 1
+            position = parent[position]
+        weight[0] += 1
+
+
+class AdaptiveHuffmanEncoder:
+    """Инкрементальный кодер: feed() возвращает готовые байты, flush() - хвост.
+
+    flush() по умолчанию завершает поток маркером конца. flush(end=False)
+    записывает маркер сброса и дополняет байт: всё поданное до этого момента
+    можно декодировать, а кодирование продолжается с тем же деревом.
+    """
+
+    def __init__(self):
+        self.tree = AdaptiveHuffmanTree()
+        self.writer = BitWriter()
+        self.finished = False
+
+    def _write_raw(self, value):
+        self.writer.write(*self.tree.code(self.tree.nyt))
+        self.writer.write(value, RAW_BITS)
+
+    def feed(self, data):
+        if self.finished:
+            raise ValueError("Поток уже завершён")
+        tree, write = self.tree, self.writer.write
+        for byte in data:
+            position = tree.leaf.get(byte)
+            if position is None:
+                self._write_raw(byte)
+                position = tree.add_symbol(byte)
+            else:
+                write(*tree.code(position))
+            tree.update(position)
+        return bytes(self.writer.drain())
+
+    def flush(self, end=True):
+        if self.finished:
+            raise ValueError("Поток уже завершён")
+        self._write_raw(END_MARKER if end else SYNC_MARKER)
+        data = bytes(self.writer.getvalue())
+        self.writer = BitWriter()
+        self.finished = end
+        return data
+
+
+class AdaptiveHuffmanDecoder:
+    """Инкрементальный декодер: feed() принимает поток кусками любой длины.
+
+    Состояние разбора (текущий узел дерева или недочитанное сырое значение)
+    сохраняется между вызовами. После маркера конца eof становится True,
+    а байты за ним складываются в unused_data.
+    """
+
+    def __init__(self):
+        self.tree = AdaptiveHuffmanTree()
+        self.eof = False
+        self.unused_data = b''
+        self._node = 0
+        self._raw_bits = 0  # сколько бит сырого значения осталось прочитать
+        self._raw = 0
+
+    def _raw_symbol(self, value, out):
+        """Обрабатывает значение после NYT; возвращает True, если нужно выровнять байт."""
+        if value == END_MARKER:
+            self.eof = True
+            return True
+        if value == SYNC_MARKER:
+            return True
+        if value > 255:
+            raise ValueError(f"Недопустимое значение после NYT: {value}")
+        out.append(value)
+        self.tree.update(self.tree.add_symbol(value))
+        return False
+
+    def feed(self, data):
+        if self.eof:
+            self.unused_data += bytes(data)
+            return b''
+        tree = self.tree
+        left, right, symbol = tree.left, tree.right, tree.symbol
+        out = bytearray()
+        node, raw_bits, raw = self._node, self._raw_bits, self._raw
+        # Первый шаг: корень-лист возможен только в пустом дереве (корень = NYT)
+        if raw_bits == 0 and node == tree.nyt:
+            raw_bits = RAW_BITS
+        for index, byte in enumerate(data):
+            for shift in range(7, -1, -1):
+                bit = (byte >> shift) & 1
+                if raw_bits:
+                    raw = (raw << 1) | bit
+                    raw_bits -= 1
+                    if raw_bits:
+                        continue
+                    align = self._raw_symbol(raw, out)
+                    raw = 0
+                    node = 0
+                    if self.eof:
+                        self.unused_data = bytes(data[index + 1:])
+                        self._node, self._raw_bits, self._raw = node, raw_bits, raw
+                        return bytes(out)
+                    if node == tree.nyt:
+                        raw_bits = RAW_BITS
+                    if align:
+                        break
+                    continue
+                node = right[node] if bit else left[node]
+                if left[node] >= 0:
+                    continue
+                if node == tree.nyt:
+                    raw_bits = RAW_BITS
+                    continue
+                out.append(symbol[node])
+                tree.update(node)
+                node = 0
+        self._node, self._raw_bits, self._raw = node, raw_bits, raw
+        return bytes(out)
+
+
+def compress(data):
+    """Сжимает байты целиком: удобная обёртка над AdaptiveHuffmanEncoder."""
+    encoder = AdaptiveHuffmanEncoder()
+    return encoder.feed(data) + encoder.flush()
+
+
+def decompress(data):
+    decoder = AdaptiveHuffmanDecoder()
+    out = decoder.feed(data)
+    if not decoder.eof:
+        raise ValueError("Поток оборван: нет маркера конца")
+    return out
+
+
+def _read_available(source, chunk_size):
+    # read1 отдаёт то, что уже пришло, не дожидаясь полного блока (сокеты, pipe)
+    read = getattr(source, 'read1', source.read)
+    return read(chunk_size)
+
+
+def compress_stream(source, target, chunk_size=CHUNK_SIZE, sync=False):
+    """Сжимает бинарный поток source в target по мере поступления данных.
+
+    При sync=True после каждого прочитанного куска записывается маркер сброса,
+    так что получатель может сразу декодировать всё переданное (логи, сокеты).
+    """
+    encoder = AdaptiveHuffmanEncoder()
+    while True:
+        chunk = _read_available(source, chunk_size)
+        if not chunk:
+            break
+        target.write(encoder.feed(chunk))
+        if sync:
+            target.write(encoder.flush(end=False))
+            target.flush()
+    target.write(encoder.flush())
+
+
+def decompress_stream(source, target, chunk_size=CHUNK_SIZE):
+    """Распаковывает поток source в target; возвращает байты после маркера конца."""
+    decoder = AdaptiveHuffmanDecoder()
+    while not decoder.eof:
+        chunk = _read_available(source, chunk_size)
+        if not chunk:
+            raise ValueError("Поток оборван: нет маркера конца")
+        target.write(decoder.feed(chunk))
+    return decoder.unused_data
+
+
+def compress_file(file_path):
+    """Сжимает файл в file_path + '.ahf'."""
+    output_path = file_path + '.ahf'
+    with open(file_path, 'rb') as source, open(output_path, 'wb') as target:
+        compress_stream(source, target)
+    return output_path
+
+
+def decompress_file(file_path):
+    """Распаковывает .ahf-файл рядом с исходным именем."""
+    output_path = file_path[:-len('.ahf')] if file_path.endswith('.ahf') else file_path + '.out'
+    with open(file_path, 'rb') as source, open(output_path, 'wb') as target:
+        decompress_stream(source, target)
+    return output_path
+
+
+if __name__ == "__main__":
+    # Фильтр для конвейеров: python adaptive_huffman.py [-d] < in > out
+    if sys.argv[1:] == ['-d']:
+        decompress_stream(sys.stdin.buffer, sys.stdout.buffer)
+    else:
+        compress_stream(sys.stdin.buffer, sys.stdout.buffer, sync=True)
@@ -0,0 +1,287 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import haffman
+import pipeline
+import rans
+import rle
+from FixedLengthEncoding import fixed_length_compress, fixed_length_decompress
+from report import print_report
+
+# Пакетное сжатие дерева каталогов.
+# Чтение и запись файлов планирует asyncio (в потоках через to_thread),
+# кодирование идёт в пуле процессов. Мелкие файлы собираются в пачки, чтобы
+# одна задача пула не сводилась к пересылке нескольких байтов. Каждый
+# сжатый файл записывается в манифест, по которому прерванная работа
+# продолжается с того же места.
+
+MANIFEST_NAME = "manifest.jsonl"
+# Расширение сжатых файлов в выходном дереве
+SUFFIX = ".cmp"
+# Файлы не меньше этого размера кодируются отдельной задачей
+SMALL_FILE_LIMIT = 1 << 20
+# Пачка мелких файлов закрывается по суммарному размеру или по числу файлов
+BATCH_BYTES = 4 << 20
+BATCH_FILES = 256
+# Задач пула в работе на один процесс: ограничивает данные в памяти
+TASKS_PER_WORKER = 2
+# Одновременных операций чтения и записи файлов
+IO_CONCURRENCY = 32
+DEFAULT_CODEC = "huffman"
+# Данные, которые кодек не уменьшил, хранятся как есть
+STORE = "store"
+
+# Кодеки по имени из манифеста: (сжатие, распаковка), bytes -> bytes
+CODECS = {
+    STORE: (bytes, bytes),
+    "huffman": (haffman.compress_message, haffman.decompress_message),
+    "rans": (rans.compress, rans.decompress),
+    "bwt": (pipeline.compress, pipeline.decompress),
+    "rle": (rle.rle_compress_bytes, rle.rle_decompress_bytes),
+    "fixed": (fixed_length_compress, fixed_length_decompress),
+}
+
+
+def encode_batch(items, codec):
+    """Задача пула: сжимает пачку (запись манифеста, данные).
+
+    Возвращает пары (дополненная запись, сжатые данные); если кодек не
+    уменьшил файл, он хранится как есть с кодеком STORE.
+    """
+    encode = CODECS[codec][0]
+    results = []
+    for entry, data in items:
+        encoded = encode(data) if data else b''
+        name = codec
+        if len(encoded) >= len(data):
+            encoded, name = data, STORE
+        entry = dict(entry, codec=name, compressed_size=len(encoded),
+                     sha256=hashlib.sha256(data).hexdigest(),
+                     compressed_sha256=hashlib.sha256(encoded).hexdigest())
+        results.append((entry, encoded))
+    return results
+
+
+def decode_batch(items):
+    """Задача пула: распаковывает пачку и сверяет контрольные суммы."""
+    results = []
+    for entry, encoded in items:
+        if hashlib.sha256(encoded).hexdigest() != entry["compressed_sha256"]:
+            raise ValueError(f"Повреждён сжатый файл: {entry['path']}")
+        data = CODECS[entry["codec"]][1](encoded)
+        if len(data) != entry["size"] or hashlib.sha256(data).hexdigest() != entry["sha256"]:
+            raise ValueError(f"Контрольная сумма не совпала: {entry['path']}")
+        results.append((entry, data))
+    return results
+
+
+def scan_tree(source_dir, exclude=None):
+    """Записи о файлах дерева (путь через '/', размер, время изменения) в порядке путей.
+
+    Каталог exclude (выходное дерево внутри исходного) пропускается.
+    """
+    exclude = os.path.realpath(exclude) if exclude else None
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(root, d)) != exclude)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            yield {
+                "path": os.path.relpath(path, source_dir).replace(os.sep, "/"),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+
+
+def plan_batches(entries, size_key="size", small_file_limit=SMALL_FILE_LIMIT, batch_bytes=BATCH_BYTES,
+                 batch_files=BATCH_FILES):
+    """Группирует файлы по размеру: крупные идут по одному, мелкие - пачками."""
+    batch, total = [], 0
+    for entry in entries:
+        if entry[size_key] >= small_file_limit:
+            yield [entry]
+            continue
+        batch.append(entry)
+        total += entry[size_key]
+        if total >= batch_bytes or len(batch) >= batch_files:
+            yield batch
+            batch, total = [], 0
+    if batch:
+        yield batch
+
+
+def load_manifest(output_dir, repair=False):
+    """Записи манифеста по пути файла (последняя запись пути главная).
+
+    Чтение останавливается на строке, оборванной прерыванием записи; с
+    repair она отрезается от файла, чтобы новые записи дописывались после
+    последней целой.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    entries = {}
+    if not os.path.exists(manifest_path):
+        return entries
+    with open(manifest_path, "rb+" if repair else "rb") as f:
+        valid_end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            entries[entry["path"]] = entry
+            valid_end += len(line)
+        if repair:
+            f.truncate(valid_end)
+    return entries
+
+
+def is_done(entry, done, output_dir):
+    """Файл уже сжат: запись есть, исходник не менялся, сжатый файл на месте."""
+    previous = done.get(entry["path"])
+    if previous is None or previous["size"] != entry["size"] or previous["mtime_ns"] != entry["mtime_ns"]:
+        return False
+    compressed_path = os.path.join(output_dir, entry["path"] + SUFFIX)
+    return os.path.exists(compressed_path) and os.path.getsize(compressed_path) == previous["compressed_size"]
+
+
+def write_file(path, data, mtime_ns=None):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+async def run_batches(batches, process, workers):
+    """Общий планировщик: чтение, задача пула и запись пачки - одна корутина.
+
+    process(pool, batch, io_limit) обрабатывает пачку. Новая пачка
+    начинается, только когда в работе меньше workers * TASKS_PER_WORKER
+    пачек, так что обход дерева не опережает кодирование.
+    """
+    task_limit = asyncio.Semaphore(workers * TASKS_PER_WORKER)
+    io_limit = asyncio.Semaphore(IO_CONCURRENCY)
+    running = set()
+
+    async def run(pool, batch):
+        try:
+            await process(pool, batch, io_limit)
+        finally:
+            task_limit.release()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in batches:
+            await task_limit.acquire()
+            task = asyncio.create_task(run(pool, batch))
+            running.add(task)
+            # Ошибка в уже завершённой пачке останавливает планирование
+            for finished in [t for t in running if t.done()]:
+                running.discard(finished)
+                finished.result()
+        await asyncio.gather(*running)
+
+
+async def compress_tree_async(source_dir, output_dir, codec=DEFAULT_CODEC, workers=None, resume=True):
+    if codec not in CODECS:
+        raise ValueError(f"Неизвестный кодек: {codec}")
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    done = await asyncio.to_thread(load_manifest, output_dir, True) if resume else {}
+    entries = await asyncio.to_thread(list, scan_tree(source_dir, exclude=output_dir))
+    pending = [entry for entry in entries if not is_done(entry, done, output_dir)]
+    stats = {"files": len(pending), "skipped": len(entries) - len(pending), "size": 0, "compressed_size": 0}
+    loop = asyncio.get_running_loop()
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), "a" if resume else "w", encoding="utf-8") as manifest:
+        async def process(pool, batch, io_limit):
+            async def read(entry):
+                async with io_limit:
+                    return entry, await asyncio.to_thread(haffman.read_file, os.path.join(source_dir, entry["path"]))
+
+            async def write(entry, encoded):
+                async with io_limit:
+                    await asyncio.to_thread(write_file, os.path.join(output_dir, entry["path"] + SUFFIX), encoded)
+
+            items = await asyncio.gather(*(read(entry) for entry in batch))
+            results = await loop.run_in_executor(pool, encode_batch, items, codec)
+            await asyncio.gather(*(write(entry, encoded) for entry, encoded in results))
+            # Запись в манифест - только после сжатого файла: по ней работа считается сделанной
+            for entry, _ in results:
+                manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                stats["size"] += entry["size"]
+                stats["compressed_size"] += entry["compressed_size"]
+            manifest.flush()
+
+        await run_batches(plan_batches(pending), process, workers)
+    return stats
+
+
+async def extract_tree_async(archive_dir, output_dir, workers=None):
+    workers = workers or os.cpu_count() or 1
+    entries = list((await asyncio.to_thread(load_manifest, archive_dir)).values())
+    loop = asyncio.get_running_loop()
+
+    async def process(pool, batch, io_limit):
+        async def read(entry):
+            async with io_limit:
+                return entry, await asyncio.to_thread(haffman.read_file,
+                                                      os.path.join(archive_dir, entry["path"] + SUFFIX))
+
+        async def write(entry, data):
+            async with io_limit:
+                await asyncio.to_thread(write_file, os.path.join(output_dir, entry["path"]), data, entry["mtime_ns"])
+
+        items = await asyncio.gather(*(read(entry) for entry in batch))
+        results = await loop.run_in_executor(pool, decode_batch, items)
+        await asyncio.gather(*(write(entry, data) for entry, data in results))
+
+    await run_batches(plan_batches(entries, size_key="compressed_size"), process, workers)
+    return len(entries)
+
+
+def compress_tree(source_dir, output_dir, codec=DEFAULT_CODEC, workers=None, resume=True):
+    """Сжимает каждый файл дерева source_dir в output_dir/<путь>.cmp.
+
+    Манифест manifest.jsonl получает по строке на файл: путь, кодек,
+    исходный и сжатый размеры, время изменения и SHA-256 исходных и
+    сжатых данных. При resume файлы, уже записанные в манифест и с тех
+    пор не изменённые, пропускаются. Возвращает сводку по сжатым файлам.
+    """
+    return asyncio.run(compress_tree_async(source_dir, output_dir, codec, workers, resume))
+
+
+def extract_tree(archive_dir, output_dir, workers=None):
+    """Восстанавливает дерево по манифесту, проверяя контрольные суммы; возвращает число файлов."""
+    return asyncio.run(extract_tree_async(archive_dir, output_dir, workers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетное сжатие дерева каталогов с манифестом")
+    parser.add_argument("source", help="исходный каталог (с -x - каталог архива)")
+    parser.add_argument("output", help="выходной каталог")
+    parser.add_argument("-x", "--extract", action="store_true", help="распаковать архив по манифесту")
+    parser.add_argument("--codec", choices=list(CODECS), default=DEFAULT_CODEC)
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию - все ядра)")
+    parser.add_argument("--no-resume", action="store_true", help="начать заново, не читая манифест")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    if args.extract:
+        count = extract_tree(args.source, args.output, args.workers)
+        print(f"Распаковано файлов: {count} за {time.perf_counter() - start_time:.3f} с")
+        return
+    stats = compress_tree(args.source, args.output, args.codec, args.workers, not args.no_resume)
+    print(f"Сжато файлов: {stats['files']}, пропущено уже сжатых: {stats['skipped']}")
+    if stats["files"]:
+        print_report(stats["size"], stats["compressed_size"], time.perf_counter() - start_time)
+
+
+if __name__ == "__main__":
+    main()
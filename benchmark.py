@@ -0,0 +1,447 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+
+import adaptive_huffman
+import haffman
+import lab2
+import main as string_huffman
+import pipeline
+import rans
+import rle
+import word_huffman
+from FixedLengthEncoding import fixed_length_compress, fixed_length_decompress
+
+# Единый стенд для сравнения кодеков: одинаковые данные, perf_counter,
+# прогрев и повторы, пиковая память через tracemalloc и честный размер в байтах.
+
+# Размеры сгенерированных данных по умолчанию: малые показывают постоянную
+# добавку заголовков и блоков, крупные - скорость
+SIZES = (1 << 10, 16 << 10, 64 << 10, 1 << 20, 8 << 20)
+REPEAT = 5
+WARMUP = 1
+SEED = 12345
+# Файлы корпуса относительно каталога репозитория
+CORPUS = ("dir/text.txt", "dir/text-rle.txt")
+# Предел размера данных для кодеков на чистом Python (побайтовые циклы)
+SLOW_CODEC_MAX_SIZE = 256 << 10
+# Падение скорости или рост размера больше этой доли считается регрессией
+REGRESSION_THRESHOLD = 0.10
+# Команды cli.py для проверки времени запуска: аргументы и тяжёлые зависимости,
+# без которых команда не работает; их импорт в бюджет не входит
+STARTUP_COMMANDS = {
+    "help": (["--help"], ()),
+    "huffman": (["huffman"], ("numpy",)),
+    "rle": (["rle"], ("numpy",)),
+    "fixed": (["fixed"], ("numpy",)),
+    "rs": (["rs"], ("numpy",)),
+    "qr": (["qr"], ("numpy", "PIL", "qrcode")),
+}
+# Бюджет импортов команды сверх интерпретатора и её тяжёлых зависимостей, мс
+STARTUP_BUDGET_MS = 30
+# Вход команд при замере запуска
+STARTUP_INPUT = b"startup\n"
+
+# encode/decode: bytes -> bytes; max_size - ограничение для медленных реализаций
+# на чистом Python; text_only - кодек принимает только текст UTF-8
+Codec = namedtuple("Codec", ["encode", "decode", "max_size", "text_only"])
+
+
+def huffman_encode(data):
+    """Канонический Хаффман из haffman: заголовок версии 3 и упакованный поток."""
+    lengths = haffman.build_code_lengths(haffman.build_frequency_table(data))
+    code_table = haffman.build_canonical_codes(lengths)
+    compressed, bit_length = haffman.compress_data(data, code_table)
+    f = io.BytesIO()
+    haffman.write_header(f, code_table, '', bit_length)
+    f.write(compressed)
+    return f.getvalue()
+
+
+def huffman_decode(blob):
+    f = io.BytesIO(blob)
+    _, _, code_table, bit_length = haffman.load_header(f)
+    return bytes(haffman.decompress_data(f.read(), bit_length, code_table))
+
+
+def rle_text_encode(data):
+    """Текстовый RLE в формате rle.compress_file: длина символа, символ, счётчик."""
+    out = bytearray()
+    for char, count in rle.rle_compress(data.decode('utf-8')):
+        char_byte = char.encode('utf-8')
+        out += len(char_byte).to_bytes(1, 'big') + char_byte + count.to_bytes(4, 'big')
+    return bytes(out)
+
+
+def rle_text_decode(blob):
+    return ''.join(rle.iter_expanded(rle.iter_runs(io.BytesIO(blob)))).encode('utf-8')
+
+
+def word_huffman_encode(data):
+    return word_huffman.compress(data.decode('utf-8'))
+
+
+def word_huffman_decode(blob):
+    return word_huffman.decompress(blob).encode('utf-8')
+
+
+def string_huffman_encode(data):
+    """Строковый Хаффман из main.py: словарь кодов в JSON, число бит и упакованные биты."""
+    text = data.decode('utf-8')
+    codebook = string_huffman.build_codes(string_huffman.count_frequency(text))
+    encoded_text = string_huffman.huffman_encode(text, codebook)
+    table = json.dumps(codebook, ensure_ascii=False).encode('utf-8')
+    bits = np.frombuffer(encoded_text.encode('ascii'), dtype=np.uint8) - ord('0')
+    return (len(table).to_bytes(4, 'big') + table + len(encoded_text).to_bytes(8, 'big')
+            + np.packbits(bits).tobytes())
+
+
+def string_huffman_decode(blob):
+    table_size = int.from_bytes(blob[:4], 'big')
+    codebook = json.loads(blob[4:4 + table_size].decode('utf-8'))
+    pos = 4 + table_size
+    bit_length = int.from_bytes(blob[pos:pos + 8], 'big')
+    bits = np.unpackbits(np.frombuffer(blob, dtype=np.uint8, offset=pos + 8))[:bit_length]
+    encoded_text = (bits + ord('0')).tobytes().decode('ascii')
+    return string_huffman.huffman_decode(encoded_text, codebook).encode('utf-8')
+
+
+def reed_solomon_encode(data, n=255, k=223, depth=lab2.INTERLEAVE_DEPTH):
+    """Данные и перемежённая чётность RS(n, k), как в protect_file, но в памяти."""
+    return lab2.protect_bytes(data, n, k, depth)
+
+
+def reed_solomon_decode(blob):
+    """Проверка синдромов всех слов; полный декодер - только для повреждённых."""
+    data, _, failed = lab2.recover_bytes(blob)
+    if failed:
+        raise ValueError(f"Неисправимые кодовые слова: {len(failed)}")
+    return data
+
+
+CODECS = {
+    "huffman": Codec(huffman_encode, huffman_decode, None, False),
+    "rans": Codec(rans.compress, rans.decompress, None, False),
+    "bwt": Codec(pipeline.compress, pipeline.decompress, SLOW_CODEC_MAX_SIZE, False),
+    "adaptive-huffman": Codec(adaptive_huffman.compress, adaptive_huffman.decompress, SLOW_CODEC_MAX_SIZE, False),
+    "rle-binary": Codec(rle.rle_compress_bytes, rle.rle_decompress_bytes, None, False),
+    "rle-text": Codec(rle_text_encode, rle_text_decode, SLOW_CODEC_MAX_SIZE, True),
+    "word-huffman": Codec(word_huffman_encode, word_huffman_decode, None, True),
+    "string-huffman": Codec(string_huffman_encode, string_huffman_decode, SLOW_CODEC_MAX_SIZE, True),
+    "fixed-length": Codec(fixed_length_compress, fixed_length_decompress, None, False),
+    "reed-solomon": Codec(reed_solomon_encode, reed_solomon_decode, None, False),
+}
+
+
+def generate_random(size, rng):
+    """Равномерно случайные байты: несжимаемые данные."""
+    return rng.integers(0, 256, size=size, dtype=np.uint8).tobytes()
+
+
+def generate_skewed(size, rng):
+    """Текст ASCII с геометрическим распределением букв: хорошо сжимается Хаффманом."""
+    letters = np.minimum(rng.geometric(0.15, size=size) - 1, 25)
+    return (letters + ord('a')).astype(np.uint8).tobytes()
+
+
+def generate_binary(size, rng):
+    """Двоичные данные из серий случайной длины: нули, 0xff и случайные байты."""
+    runs = rng.geometric(0.02, size=size // 16 + 1)
+    values = rng.choice(np.array([0, 0, 0xff, 0x41], dtype=np.uint8), size=len(runs))
+    data = np.repeat(values, runs)[:size]
+    noise = rng.random(len(data)) < 0.01
+    data[noise] = rng.integers(0, 256, size=int(noise.sum()), dtype=np.uint8)
+    return data.tobytes()
+
+
+GENERATORS = {
+    "random": generate_random,
+    "skewed": generate_skewed,
+    "binary": generate_binary,
+}
+
+
+def build_corpus(sizes=SIZES, seed=SEED, files=CORPUS):
+    """Список (имя, данные): файлы из репозитория и сгенерированные наборы."""
+    corpus = []
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in files:
+        path = os.path.join(root, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                corpus.append((name, f.read()))
+    for kind, generate in GENERATORS.items():
+        for size in sizes:
+            corpus.append((f"{kind}-{size}", generate(size, np.random.default_rng(seed))))
+    return corpus
+
+
+def is_text(data):
+    try:
+        data.decode('utf-8')
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def time_call(function, argument, repeat=REPEAT, warmup=WARMUP):
+    """Результат и список времён (perf_counter) repeat вызовов после warmup прогревов."""
+    for _ in range(warmup):
+        function(argument)
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(argument)
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+def peak_memory(function, argument):
+    """Пиковый объём памяти, выделенной за один вызов (отдельный прогон: tracemalloc замедляет код)."""
+    tracemalloc.start()
+    try:
+        function(argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def megabytes_per_second(size, seconds):
+    return size / seconds / 1e6 if seconds > 0 else None
+
+
+def run_codec(name, codec, dataset, data, repeat=REPEAT, warmup=WARMUP):
+    encoded, encode_times = time_call(codec.encode, data, repeat, warmup)
+    decoded, decode_times = time_call(codec.decode, encoded, repeat, warmup)
+    if decoded != data:
+        raise ValueError(f"{name}: данные {dataset} не восстановились после распаковки")
+    return {
+        "codec": name,
+        "dataset": dataset,
+        "size": len(data),
+        "compressed_size": len(encoded),
+        "ratio": len(data) / len(encoded) if encoded else None,
+        "encode_seconds": min(encode_times),
+        "decode_seconds": min(decode_times),
+        "encode_seconds_median": float(np.median(encode_times)),
+        "decode_seconds_median": float(np.median(decode_times)),
+        "encode_mb_s": megabytes_per_second(len(data), min(encode_times)),
+        "decode_mb_s": megabytes_per_second(len(data), min(decode_times)),
+        "encode_peak_bytes": peak_memory(codec.encode, data),
+        "decode_peak_bytes": peak_memory(codec.decode, encoded),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(codecs=None, sizes=SIZES, repeat=REPEAT, warmup=WARMUP, seed=SEED):
+    """Прогоняет выбранные кодеки по всему корпусу; возвращает отчёт для JSON."""
+    names = codecs or list(CODECS)
+    for name in names:
+        if name not in CODECS:
+            raise ValueError(f"Неизвестный кодек: {name}")
+    results = []
+    for dataset, data in build_corpus(sizes, seed):
+        text = is_text(data)
+        for name in names:
+            codec = CODECS[name]
+            if codec.max_size is not None and len(data) > codec.max_size:
+                continue
+            if codec.text_only and not text:
+                continue
+            result = run_codec(name, codec, dataset, data, repeat, warmup)
+            print_result(result)
+            results.append(result)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "warmup": warmup,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def print_result(result):
+    print(f"{result['codec']:<17} {result['dataset']:<22} {result['size']:>10} -> {result['compressed_size']:>10} "
+          f"x{result['ratio']:.3f}  enc {result['encode_mb_s']:8.2f} MB/s  dec {result['decode_mb_s']:8.2f} MB/s  "
+          f"mem {result['encode_peak_bytes'] >> 10}/{result['decode_peak_bytes'] >> 10} KiB", flush=True)
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Список регрессий current относительно baseline (оба - отчёты run_benchmarks).
+
+    Сравниваются только пары (кодек, набор), есть в обоих отчётах: скорость
+    кодирования и декодирования и размер сжатых данных.
+    """
+    old = {(r["codec"], r["dataset"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = old.get((result["codec"], result["dataset"]))
+        if before is None:
+            continue
+        for key in ("encode_mb_s", "decode_mb_s"):
+            if before[key] and result[key] < before[key] * (1 - threshold):
+                regressions.append((result["codec"], result["dataset"], key, before[key], result[key]))
+        if result["compressed_size"] > before["compressed_size"] * (1 + threshold):
+            regressions.append((result["codec"], result["dataset"], "compressed_size",
+                                before["compressed_size"], result["compressed_size"]))
+    return regressions
+
+
+def import_rows(stderr):
+    """Строки вывода python -X importtime: (вложенность, модуль, собственное время в мкс)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        rows.append((len(name) - len(name.lstrip()), name.strip(), int(self_us)))
+    return rows
+
+
+def own_imports(rows, exempt=(), baseline=frozenset()):
+    """Модули команды без пакетов exempt (со всем, что они импортируют) и без
+    модулей baseline, которые интерпретатор загружает при любом запуске.
+
+    importtime печатает модуль после его вложенных импортов, поэтому
+    строки обходятся с конца: родитель встречается раньше своих детей.
+    """
+    own = []
+    stack = []
+    for level, name, self_us in reversed(rows):
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        skipped = (stack and stack[-1][1]) or name.split(".")[0] in exempt
+        stack.append((level, skipped))
+        if not skipped and name not in baseline:
+            own.append((name, self_us))
+    return own
+
+
+def wall_time(command, stdin=STARTUP_INPUT):
+    start = time.perf_counter()
+    subprocess.run(command, input=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def measure_startup(commands=STARTUP_COMMANDS, repeat=REPEAT):
+    """Время запуска команд cli.py: полное (лучшее из repeat) и импорты по python -X importtime.
+
+    Замер предполагает свежие .pyc модулей репозитория, иначе в импорт войдёт компиляция.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    cli = os.path.join(root, "cli.py")
+    empty = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True)
+    baseline = {name for _, name, _ in import_rows(empty.stderr)}
+    report = {
+        "interpreter_ms": min(wall_time([sys.executable, "-c", "pass"]) for _ in range(repeat)) * 1e3,
+        "commands": [],
+    }
+    for name, (args, exempt) in commands.items():
+        best = None
+        for _ in range(repeat):
+            run = subprocess.run([sys.executable, "-X", "importtime", cli, *args], input=STARTUP_INPUT,
+                                 capture_output=True)
+            stderr = run.stderr.decode("utf-8", "replace")
+            if run.returncode:
+                # Например, не установлены qrcode и Pillow: команду нечем измерять
+                best = {"command": name, "error": stderr.strip().splitlines()[-1]}
+                break
+            rows = import_rows(stderr)
+            own = own_imports(rows, exempt, baseline)
+            own_ms = sum(self_us for _, self_us in own) / 1e3
+            # Из повторов берётся прогон с наименьшим временем своих импортов
+            if best is None or own_ms < best["own_import_ms"]:
+                best = {
+                    "command": name,
+                    "import_ms": sum(self_us for _, _, self_us in rows) / 1e3,
+                    "own_import_ms": own_ms,
+                    "slowest": [module for module, _ in sorted(own, key=lambda item: item[1], reverse=True)[:3]],
+                }
+        if "error" not in best:
+            best["wall_ms"] = min(wall_time([sys.executable, cli, *args]) for _ in range(repeat)) * 1e3
+        report["commands"].append(best)
+    return report
+
+
+def print_startup(report, budget=STARTUP_BUDGET_MS):
+    """Таблица запуска команд; возвращает команды, чьи собственные импорты превысили budget."""
+    print(f"Пустой запуск интерпретатора: {report['interpreter_ms']:.1f} мс")
+    print(f"{'команда':10} {'запуск, мс':>11} {'импорты, мс':>12} {'свои, мс':>9}  самые долгие свои модули")
+    over = []
+    for result in report["commands"]:
+        if "error" in result:
+            print(f"{result['command']:10} не запускается: {result['error']}")
+            continue
+        print(f"{result['command']:10} {result['wall_ms']:>11.1f} {result['import_ms']:>12.1f} "
+              f"{result['own_import_ms']:>9.1f}  {', '.join(result['slowest'])}")
+        if result["own_import_ms"] > budget:
+            over.append(result["command"])
+    return over
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение скорости, памяти и степени сжатия кодеков")
+    parser.add_argument("--codecs", nargs="+", choices=list(CODECS), help="какие кодеки запускать (по умолчанию все)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES), help="размеры сгенерированных данных")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default="benchmark.json", help="куда записать результаты в JSON")
+    parser.add_argument("--compare", help="предыдущий JSON-отчёт для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--startup", action="store_true", help="только проверка времени запуска cli.py")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_MS,
+                        help="бюджет импортов команды в мс сверх её тяжёлых зависимостей")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        import compileall
+
+        # Без свежих .pyc (например, при PYTHONDONTWRITEBYTECODE) замер показал бы компиляцию, а не импорт
+        compileall.compile_dir(os.path.dirname(os.path.abspath(__file__)), maxlevels=0, quiet=1)
+        over = print_startup(measure_startup(repeat=args.repeat), args.startup_budget)
+        for command in over:
+            print(f"Регрессия: запуск {command} дольше {args.startup_budget:g} мс")
+        return 1 if over else 0
+
+    report = run_benchmarks(args.codecs, args.sizes, args.repeat, args.warmup, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for codec, dataset, key, before, after in regressions:
+            print(f"Регрессия: {codec} / {dataset}: {key} {before:.3f} -> {after:.3f}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
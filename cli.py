@@ -0,0 +1,108 @@
+import argparse
+import importlib
+import sys
+
+# Единая точка входа без интерактивных вопросов:
+#   python cli.py huffman < text.txt > text.huf
+#   python cli.py huffman -d < text.huf > text.txt
+#   python cli.py rs < file | python cli.py rs -d > file.copy
+#   echo -n "текст" | python cli.py qr > code.png
+# Данные читаются из stdin (или -i) и пишутся в stdout (или -o), поэтому
+# команды соединяются конвейером. Модуль кодека импортируется только в
+# обработчике своей команды: ради --help или текстового кодека не грузятся
+# ни NumPy, ни qrcode с Pillow. Ленивую загрузку проверяет tests/test_startup.py,
+# время запуска показывает benchmark.py --startup.
+
+# Кодеки bytes -> bytes: модуль, функция сжатия и функция распаковки
+CODECS = {
+    "huffman": ("haffman", "compress_message", "decompress_message"),
+    "rle": ("rle", "rle_compress_bytes", "rle_decompress_bytes"),
+    "fixed": ("FixedLengthEncoding", "fixed_length_compress", "fixed_length_decompress"),
+}
+# Поля для команды rs: размер поля -> имя примитивного многочлена в lab2
+RS_FIELDS = {256: "GF256_POLYNOMIAL", 65536: "GF65536_POLYNOMIAL"}
+
+
+def run_codec(args, data):
+    module_name, encode, decode = CODECS[args.command]
+    module = importlib.import_module(module_name)
+    return getattr(module, decode if args.decompress else encode)(data)
+
+
+def run_rs(args, data):
+    """Данные с чётностью RS(n, k) или, с -d, исправленные данные; отчёт об исправлении - в stderr."""
+    import lab2
+
+    if not args.decompress:
+        field = lab2.GaloisField(args.field, getattr(lab2, RS_FIELDS[args.field]))
+        return lab2.protect_bytes(data, args.n, args.k, args.depth, field)
+    data, repaired, failed = lab2.recover_bytes(data)
+    if repaired:
+        print(f"Исправлено кодовых слов: {repaired}", file=sys.stderr)
+    if failed:
+        raise ValueError(f"Неисправимые кодовые слова: {', '.join(map(str, failed))}")
+    return data
+
+
+def run_qr(args, data):
+    """PNG с QR-кодом текста (UTF-8, без завершающего перевода строки)."""
+    import io
+
+    import qr
+
+    image = qr.generate_qr(data.decode('utf-8').rstrip('\n'), args.fill, args.back)
+    out = io.BytesIO()
+    image.save(out, format="PNG", compress_level=qr.PNG_COMPRESS_LEVEL)
+    return out.getvalue()
+
+
+def build_parser():
+    files = argparse.ArgumentParser(add_help=False)
+    files.add_argument("-i", "--input", help="входной файл (по умолчанию stdin)")
+    files.add_argument("-o", "--output", help="выходной файл (по умолчанию stdout)")
+    codec = argparse.ArgumentParser(add_help=False, parents=[files])
+    codec.add_argument("-d", "--decompress", action="store_true", help="распаковать")
+
+    parser = argparse.ArgumentParser(description="Кодеки: сжатие, помехоустойчивое кодирование и QR-коды")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("huffman", parents=[codec], help="канонический код Хаффмана")
+    commands.add_parser("rle", parents=[codec], help="кодирование длин серий")
+    commands.add_parser("fixed", parents=[codec], help="код постоянной длины")
+    rs = commands.add_parser("rs", parents=[codec], help="код Рида-Соломона: чётность или исправление (-d)")
+    rs.add_argument("-n", type=int, default=255, help="длина кодового слова в символах поля")
+    rs.add_argument("-k", type=int, default=223, help="символов данных в слове")
+    rs.add_argument("--depth", type=int, default=None, help="глубина перемежения (по умолчанию - по полю)")
+    rs.add_argument("--field", type=int, choices=list(RS_FIELDS), default=256, help="размер поля")
+    qr = commands.add_parser("qr", parents=[files], help="QR-код текста в PNG")
+    qr.add_argument("--fill", default="black", help="цвет модулей")
+    qr.add_argument("--back", default="white", help="цвет фона")
+    return parser
+
+
+HANDLERS = {"rs": run_rs, "qr": run_qr}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.input:
+        with open(args.input, "rb") as f:
+            data = f.read()
+    else:
+        data = sys.stdin.buffer.read()
+    try:
+        result = HANDLERS.get(args.command, run_codec)(args, data)
+    except ValueError as e:
+        # Повреждённые или обрезанные данные - одна строка ошибки вместо трассировки
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(result)
+    else:
+        sys.stdout.buffer.write(result)
+        sys.stdout.buffer.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,121 +1,1123 @@
-import heapq
+import io
+import mmap
 import os
-from collections import Counter, namedtuple
+import time
+from array import array
+from collections import Counter, deque, namedtuple
+from contextlib import contextmanager
+from functools import lru_cache, partial
 
+import numpy as np
+
+import instrument
+import rans
+from report import print_report
+
+# Размер блока чтения файлов: столько данных одновременно находится в памяти
+CHUNK_SIZE = 1 << 20
+# Размер независимо кодируемого блока в блочном контейнере
+BLOCK_SIZE = 1 << 22
+# Срез данных для одного вызова bincount при подсчёте частот
+COUNT_CHUNK_SIZE = 1 << 16
+# Сколько символов упаковывается за один векторный проход
+PACK_CHUNK_SIZE = 1 << 18
+# Данные короче этого кодируются побайтовым циклом без NumPy
+SCALAR_WRITE_LIMIT = 512
+# Сколько бит декодер просматривает за один поиск в таблице
+DECODE_TABLE_BITS = 12
+# Ограничение длины кода по умолчанию: длина помещается в полубайт заголовка
+MAX_CODE_LENGTH = 15
+
+# Сигнатура и версия формата; файлы без сигнатуры — исходный формат (версия 1).
+# Версия 2 хранит только длины кодов, версия 3 — ещё и 64-битную длину потока,
+# версия 4 — блочный контейнер из независимо закодированных блоков,
+# версия 5 — вместо таблицы ссылка на обученную модель по её отпечатку,
+# версия 6 — поток rANS (модуль rans) с квантованными частотами,
+# версия 7 — блоки конвейера BWT/MTF/RLE/Хаффман (модуль pipeline).
+MAGIC = b'\xffHF'
+FORMAT_VERSION = 3
+BLOCK_FORMAT_VERSION = 4
+MODEL_FORMAT_VERSION = 5
+RANS_FORMAT_VERSION = 6
+PIPELINE_FORMAT_VERSION = 7
+# Кодеры, которые выбираются флагом method в compress_file
+METHODS = ('huffman', 'rans', 'bwt')
+# Файл модели: сигнатура, отпечаток и длины кодов в формате заголовка
+MODEL_MAGIC = b'HFMD'
+MODEL_ID_SIZE = 8
+# Каталог, где ищутся модели, на которые ссылаются сжатые данные
+MODEL_DIR = os.environ.get('HAFFMAN_MODEL_DIR', 'models')
+# Сколько построенных наборов таблиц моделей держать в памяти
+MODEL_CACHE_SIZE = 32
+# Флаг блока: блок закодирован собственной таблицей, а не общей
+BLOCK_OWN_TABLE = 1
+# Признак индекса произвольного доступа в конце файла версии 3
+INDEX_MAGIC = b'HFIX'
+# Способы хранения длин кодов в заголовке версии 2
+LENGTHS_NIBBLES = 0
+LENGTHS_BYTES = 1
+LENGTHS_SPARSE = 2
+
+def count_symbols(data, chunk_size=COUNT_CHUNK_SIZE):
+    """Частоты байтов массивом из 256 счётчиков.
+
+    bincount идёт по срезам представления данных без копирования: данные
+    не превращаются в объекты Python, а временный массив индексов
+    ограничен размером среза.
+    """
+    counts = np.zeros(256, dtype=np.int64)
+    symbols = np.frombuffer(data, dtype=np.uint8)
+    for i in range(0, len(symbols), chunk_size):
+        counts += np.bincount(symbols[i:i + chunk_size], minlength=256)
+    return counts
+
+
+def frequencies_from_counts(counts):
+    present = np.flatnonzero(counts)
+    return Counter(dict(zip(present.tolist(), counts[present].tolist())))
+
+
+@instrument.stage("build_frequency_table", measure_output=False)
 def build_frequency_table(data):
-    return Counter(data)
-
-
-def build_huffman_tree(frequency_table):
-    heap = [HuffmanNode(freq, symbol, None, None) for symbol, freq in frequency_table.items()]
-    heapq.heapify(heap)
-    if len (heap) == 1:
-        return HuffmanNode(heap[0].frequency, None, heap[0],None )
-    while len(heap) > 1:
-        left = heapq.heappop(heap)
-        right = heapq.heappop(heap)
-        merged_node = HuffmanNode(left.frequency + right.frequency, None, left, right)
-        heapq.heappush(heap, merged_node)
-    return heap[0] if heap else None
-
-
-def build_huffman_codes(node, prefix="", code_table={}):
-    if node is not None:
-        if node.symbol is not None:
-            code_table[node.symbol] = prefix
-        build_huffman_codes(node.left, prefix + "0", code_table)
-        build_huffman_codes(node.right, prefix + "1", code_table)
+    return frequencies_from_counts(count_symbols(data))
+
+
+@contextmanager
+def map_file(file_path):
+    """Отображение файла в память только для чтения; для пустого файла — пустые bytes."""
+    with open(file_path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            yield mapping
+
+
+def _count_file_range(item):
+    file_path, offset, length = item
+    with map_file(file_path) as mapping, memoryview(mapping) as data:
+        return count_symbols(data[offset:offset + length])
+
+
+@instrument.stage("count_file_symbols", data_arg=1, measure_output=False)
+def count_file_symbols(file_path, mapping, workers=1, chunk_size=BLOCK_SIZE):
+    """Частоты байтов отображённого файла; при workers > 1 куски считаются в пуле процессов.
+
+    Каждый процесс сам отображает свой участок файла, так что данные
+    между процессами не пересылаются.
+    """
+    if workers > 1 and len(mapping) > chunk_size:
+        ranges = ((file_path, offset, chunk_size) for offset in range(0, len(mapping), chunk_size))
+        return sum(parallel_map(_count_file_range, ranges, workers), np.zeros(256, dtype=np.int64))
+    return count_symbols(mapping)
+
+
+def huffman_code_lengths(counts):
+    """Длины кодов Хаффмана для массива частот (все больше нуля) без узлов дерева.
+
+    Частоты сортируются, после чего две очереди - листья по возрастанию
+    веса и внутренние узлы в порядке создания (их веса тоже не убывают) -
+    сливаются за O(n). От дерева остаётся только массив родителей, глубины
+    считаются итеративно от корня. Длины возвращаются в порядке counts.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    n = len(counts)
+    if n <= 1:
+        return np.ones(n, dtype=np.int64)
+    order = np.argsort(counts, kind='stable')
+    leaves = counts[order].tolist()
+    internal = [0] * (n - 1)
+    # Родители узлов: листья 0..n-1 (в порядке order), внутренние n..2n-2
+    parent = [0] * (2 * n - 1)
+    leaf = node = 0
+    for k in range(n - 1):
+        weight = 0
+        for _ in range(2):
+            # При равных весах берётся лист: дерево получается ниже
+            if leaf < n and (node == k or leaves[leaf] <= internal[node]):
+                weight += leaves[leaf]
+                parent[leaf] = n + k
+                leaf += 1
+            else:
+                weight += internal[node]
+                parent[n + node] = n + k
+                node += 1
+        internal[k] = weight
+    # Внутренний узел создаётся раньше своего родителя: проход от корня назад
+    depth = [0] * (n - 1)
+    for k in range(n - 3, -1, -1):
+        depth[k] = depth[parent[n + k] - n] + 1
+    lengths = np.empty(n, dtype=np.int64)
+    lengths[order] = np.array(depth)[np.array(parent[:n]) - n] + 1
+    return lengths
+
+
+def limit_code_lengths(counts, lengths, max_code_length):
+    """Ограничивает длины кодов max_code_length.
+
+    Длинные коды укорачиваются до предела, а неравенство Крафта
+    восстанавливается удлинением самых длинных из оставшихся кодов (как в
+    zlib/miniz). Короткие длины достаются частым символам.
+    """
+    if (1 << max_code_length) < len(lengths):
+        raise ValueError(f"Нельзя закодировать {len(lengths)} символов кодами длиной до {max_code_length} бит")
+    if not len(lengths) or lengths.max() <= max_code_length:
+        return lengths
+    # Число кодов каждой длины, всё длиннее предела переносится на предел
+    length_counts = np.bincount(np.minimum(lengths, max_code_length), minlength=max_code_length + 1).tolist()
+    total = sum(length_counts[i] << (max_code_length - i) for i in range(1, max_code_length + 1))
+    while total > 1 << max_code_length:
+        length_counts[max_code_length] -= 1
+        for i in range(max_code_length - 1, 0, -1):
+            if length_counts[i]:
+                length_counts[i] -= 1
+                length_counts[i + 1] += 2
+                break
+        total -= 1
+    # Символы по убыванию частоты, при равной частоте - по порядку в counts
+    by_frequency = np.lexsort((np.arange(len(counts)), -np.asarray(counts)))
+    limited = np.empty_like(lengths)
+    limited[by_frequency] = np.repeat(np.arange(max_code_length + 1), length_counts)
+    return limited
+
+
+@instrument.stage("build_code_lengths", data_arg=None, measure_output=False)
+def build_code_lengths(frequency_table, max_code_length=MAX_CODE_LENGTH):
+    """Длины кодов Хаффмана {символ: длина}, ограниченные max_code_length.
+
+    Строятся по массивам (huffman_code_lengths, limit_code_lengths), без
+    дерева узлов.
+    """
+    symbols = sorted(frequency_table)
+    counts = np.array([frequency_table[symbol] for symbol in symbols], dtype=np.int64)
+    lengths = limit_code_lengths(counts, huffman_code_lengths(counts), max_code_length)
+    return dict(zip(symbols, lengths.tolist()))
+
+
+@instrument.stage("build_canonical_codes", data_arg=None, measure_output=False)
+def build_canonical_codes(code_lengths):
+    """Канонические коды: символы упорядочены по (длина, символ), коды идут подряд."""
+    code_table = {}
+    code = 0
+    previous_length = 0
+    for symbol, length in sorted(code_lengths.items(), key=lambda item: (item[1], item[0])):
+        code <<= length - previous_length
+        code_table[symbol] = format(code, f'0{length}b')
+        code += 1
+        previous_length = length
     return code_table
 
 
+def canonical_code_values(lengths):
+    """Канонические коды целыми числами для массива длин, как в build_canonical_codes:
+    символы упорядочены по (длина, номер), коды одной длины идут подряд."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    codes = np.zeros(len(lengths), dtype=np.uint64)
+    if not len(lengths):
+        return codes
+    order = np.lexsort((np.arange(len(lengths)), lengths))
+    sorted_lengths = lengths[order]
+    length_counts = np.bincount(sorted_lengths).tolist()
+    first = [0] * len(length_counts)
+    code = 0
+    for length in range(2, len(length_counts)):
+        code = (code + length_counts[length - 1]) << 1
+        first[length] = code
+    # Номер символа внутри группы своей длины
+    ranks = np.arange(len(lengths)) - np.searchsorted(sorted_lengths, sorted_lengths)
+    codes[order] = np.array(first, dtype=np.uint64)[sorted_lengths] + ranks.astype(np.uint64)
+    return codes
+
+
+def build_encode_table(code_table):
+    """Таблица (код, длина) в виде целых чисел для каждого из 256 байтов."""
+    table = [(0, 0)] * 256
+    for symbol, code in code_table.items():
+        table[symbol] = (int(code, 2), len(code))
+    return table
+
+
+class BitWriter:
+    """Упаковывает коды переменной длины в bytearray, старший бит первым.
+
+    Неполное 64-битное слово хранится в аккумуляторе, в буфер попадают
+    только целые слова.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.bit_length = 0
+        self._acc = 0
+        self._acc_bits = 0
+
+    def write(self, code, length):
+        self._acc = (self._acc << length) | code
+        self._acc_bits += length
+        self.bit_length += length
+        while self._acc_bits >= 64:
+            self._acc_bits -= 64
+            self.buffer += (self._acc >> self._acc_bits).to_bytes(8, 'big')
+            self._acc &= (1 << self._acc_bits) - 1
+
+    def write_symbols(self, data, encode_table):
+        """Кодирует байты data по таблице (код, длина) векторно, блоками."""
+        max_length = max(length for _, length in encode_table)
+        if max_length > 64 or len(data) < SCALAR_WRITE_LIMIT:
+            # Короткие сообщения быстрее закодировать циклом, чем готовить массивы
+            for byte in data:
+                self.write(*encode_table[byte])
+            return
+        # Код каждого символа выровнен по старшему биту 64-битного слова
+        aligned = np.array([code << (64 - length) if length else 0
+                            for code, length in encode_table], dtype=np.uint64)
+        lengths = np.array([length for _, length in encode_table], dtype=np.uint64)
+        symbols = np.frombuffer(data, dtype=np.uint8)
+        for i in range(0, len(symbols), PACK_CHUNK_SIZE):
+            self._pack_chunk(symbols[i:i + PACK_CHUNK_SIZE], aligned, lengths)
+
+    def write_indices(self, symbols, codes, lengths):
+        """Кодирует массив номеров символов по массивам кодов и длин (до 64 бит).
+
+        В отличие от write_symbols алфавит не ограничен байтами: так пишутся
+        потоки слов и других больших алфавитов.
+        """
+        lengths = np.asarray(lengths, dtype=np.uint64)
+        aligned = np.where(lengths > 0, np.asarray(codes, dtype=np.uint64) << (np.uint64(64) - lengths),
+                           np.uint64(0)).astype(np.uint64)
+        for i in range(0, len(symbols), PACK_CHUNK_SIZE):
+            self._pack_chunk(symbols[i:i + PACK_CHUNK_SIZE], aligned, lengths)
+
+    def _pack_chunk(self, symbols, aligned, lengths):
+        n = len(symbols)
+        carry_bits = self._acc_bits
+        # Битовое смещение начала каждого кода относительно начала слова аккумулятора
+        start = np.empty(n + 1, dtype=np.uint64)
+        start[0] = 0
+        np.cumsum(lengths[symbols], out=start[1:])
+        start += np.uint64(carry_bits)
+        total_bits = int(start[-1])
+        start = start[:-1]
+
+        word_index = start >> np.uint64(6)
+        offset = start & np.uint64(63)
+        codes = aligned[symbols]
+        # Часть кода, попадающая в своё слово, и часть, перетекающая в следующее
+        head = codes >> offset
+        spill = codes << (np.uint64(64) - offset)
+
+        words = np.zeros((total_bits >> 6) + 2, dtype=np.uint64)
+        boundaries = np.flatnonzero(word_index[1:] != word_index[:-1]) + 1
+        first = np.concatenate(([0], boundaries))
+        last = np.append(boundaries - 1, n - 1)
+        indices = word_index[first].astype(np.intp)
+        words[indices] = np.bitwise_or.reduceat(head, first)
+        words[indices + 1] |= spill[last]
+        if carry_bits:
+            words[0] |= np.uint64(self._acc << (64 - carry_bits))
+
+        full_words = total_bits >> 6
+        self.buffer += words[:full_words].astype('>u8').tobytes()
+        self._acc_bits = total_bits & 63
+        self._acc = int(words[full_words]) >> (64 - self._acc_bits) if self._acc_bits else 0
+        self.bit_length += total_bits - carry_bits
+
+    def drain(self):
+        """Забирает накопленные целые слова; неполное слово остаётся в аккумуляторе."""
+        data = self.buffer
+        self.buffer = bytearray()
+        return data
+
+    def getvalue(self):
+        """Упакованные данные; последний байт дополнен нулевыми битами."""
+        tail_bytes = (self._acc_bits + 7) // 8
+        tail = self._acc << (tail_bytes * 8 - self._acc_bits)
+        return self.buffer + tail.to_bytes(tail_bytes, 'big')
+
+
+@instrument.stage("compress_data")
 def compress_data(data, code_table):
-    return "".join(code_table[byte] for byte in data)
+    """Возвращает упакованные байты и точное число значащих бит."""
+    writer = BitWriter()
+    writer.write_symbols(data, build_encode_table(code_table))
+    return writer.getvalue(), writer.bit_length
+
+
+def write_code_lengths(f, code_lengths):
+    """Записывает длины кодов в самом компактном из трёх представлений."""
+    if len(code_lengths) < 64:
+        # Немного символов: пары (символ, длина)
+        f.write(bytes([LENGTHS_SPARSE, len(code_lengths)]))
+        for symbol in sorted(code_lengths):
+            f.write(bytes([symbol, code_lengths[symbol]]))
+        return
+    lengths = [code_lengths.get(symbol, 0) for symbol in range(256)]
+    if max(lengths) <= 15:
+        f.write(bytes([LENGTHS_NIBBLES]))
+        f.write(bytes(lengths[i] << 4 | lengths[i + 1] for i in range(0, 256, 2)))
+    else:
+        f.write(bytes([LENGTHS_BYTES]))
+        f.write(bytes(lengths))
+
+
+def read_exact(f, size):
+    """Ровно size байтов заголовка; если файл кончился раньше - ValueError."""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Заголовок обрывается раньше конца")
+    return data
+
+
+def read_extension(f):
+    """Расширение исходного файла: длина (1 байт) и само расширение."""
+    return read_exact(f, read_exact(f, 1)[0]).decode()
+
 
+def read_code_lengths(f):
+    kind = read_exact(f, 1)[0]
+    if kind == LENGTHS_SPARSE:
+        count = read_exact(f, 1)[0]
+        pairs = read_exact(f, 2 * count)
+        return {pairs[i]: pairs[i + 1] for i in range(0, len(pairs), 2)}
+    if kind == LENGTHS_NIBBLES:
+        packed = read_exact(f, 128)
+        lengths = [nibble for byte in packed for nibble in (byte >> 4, byte & 15)]
+    elif kind == LENGTHS_BYTES:
+        lengths = read_exact(f, 256)
+    else:
+        raise ValueError(f"Неизвестный способ хранения длин кодов: {kind}")
+    return {symbol: length for symbol, length in enumerate(lengths) if length}
+
+
+def write_header(f, code_table, file_extension, bit_length=None, version=FORMAT_VERSION):
+    """Заголовок текущей версии; code_table должна быть канонической.
+
+    У блочного контейнера длины потока в заголовке нет: её хранит каждый блок.
+    """
+    f.write(MAGIC)
+    f.write(bytes([version]))
+
+    # Save file extension length and extension itself
+    f.write(len(file_extension).to_bytes(1, 'big'))
+    f.write(file_extension.encode())
+
+    # Канонические коды восстанавливаются по одним длинам
+    write_code_lengths(f, {symbol: len(code) for symbol, code in code_table.items()})
+    if bit_length is not None:
+        f.write(bit_length.to_bytes(8, 'big'))
 
-def save_compressed_file(output_path, compressed_data, code_table, file_extension):
+
+@instrument.stage("save_compressed_file", data_arg=1, measure_output=False)
+def save_compressed_file(output_path, compressed_data, bit_length, code_table, file_extension):
     with open(output_path, "wb") as f:
-        # Save file extension length and extension itself
-        f.write(len(file_extension).to_bytes(1, 'big'))
-        f.write(file_extension.encode())
-
-        # Save the frequency table
-        f.write(len(code_table).to_bytes(4, 'big'))
-        for symbol, code in code_table.items():
-            f.write(symbol.to_bytes(1, 'big'))
-            f.write(len(code).to_bytes(1, 'big'))
-            f.write(int(code, 2).to_bytes((len(code) + 7) // 8, 'big'))
-
-        # Calculate padding required to make binary data a multiple of 8
-        padding_length = (8 - len(compressed_data) % 8) % 8
-        compressed_data += '0' * padding_length
-
-        # Store padding information and write compressed data
-        f.write(padding_length.to_bytes(1, 'big'))
-        binary_data = int(compressed_data, 2).to_bytes(len(compressed_data) // 8, 'big')
-        f.write(len(compressed_data).to_bytes(4, 'big'))
-        f.write(binary_data)
-
-class HuffmanNode(namedtuple("Node", ["frequency", "symbol", "left", "right"])):
-    def __lt__(self, other):
-        return self.frequency < other.frequency
+        write_header(f, code_table, file_extension, bit_length)
+        f.write(compressed_data)
+
+
+@instrument.stage("load_header", data_arg=None, measure_output=False)
+def load_header(f):
+    """Читает заголовок любой версии.
+
+    Возвращает версию, расширение, таблицу {код: символ} (для версии 5 —
+    готовый Decoder модели, для версии 6 — таблицы rANS, для версии 7 —
+    стадии конвейера) и длину потока в битах (None для блочного контейнера,
+    rANS и конвейера: там длины у блоков).
+    """
+    if f.read(len(MAGIC)) != MAGIC:
+        f.seek(0)
+        version = 1
+    else:
+        version = read_exact(f, 1)[0]
+        if not 2 <= version <= PIPELINE_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия формата: {version}")
+
+    if version == 1:
+        file_extension, code_table = load_code_table_v1(f)
+    elif version == MODEL_FORMAT_VERSION:
+        file_extension = read_extension(f)
+        # Готовый декодер модели из кэша: таблицы не перестраиваются
+        code_table = model_tables(read_exact(f, MODEL_ID_SIZE)).decoder
+    elif version == RANS_FORMAT_VERSION:
+        file_extension = read_extension(f)
+        code_table = rans.build_tables(rans.read_frequencies(f))
+    elif version == PIPELINE_FORMAT_VERSION:
+        import pipeline  # pipeline сам импортирует haffman
+
+        file_extension = read_extension(f)
+        code_table = pipeline.read_stages(f)
+    else:
+        file_extension, code_table = load_code_table(f)
+
+    if version in (BLOCK_FORMAT_VERSION, RANS_FORMAT_VERSION, PIPELINE_FORMAT_VERSION):
+        bit_length = None
+    elif version < 3:
+        padding_length = read_exact(f, 1)[0]
+        bit_length = int.from_bytes(read_exact(f, 4), 'big') - padding_length
+    else:
+        bit_length = int.from_bytes(read_exact(f, 8), 'big')
+    return version, file_extension, code_table, bit_length
+
 
 def load_code_table(f):
+    file_extension = read_extension(f)
+    code_table = build_canonical_codes(read_code_lengths(f))
+    return file_extension, {code: symbol for symbol, code in code_table.items()}
+
 
-    ext_length = int.from_bytes(f.read(1), 'big')
-    file_extension = f.read(ext_length).decode()
+def load_code_table_v1(f):
+    """Заголовок исходного формата: коды символов хранятся целиком."""
+    file_extension = read_extension(f)
 
     code_table = {}
-    num_symbols = int.from_bytes(f.read(4), 'big')
+    num_symbols = int.from_bytes(read_exact(f, 4), 'big')
     for _ in range(num_symbols):
-        symbol = int.from_bytes(f.read(1), 'big')
-        code_length = int.from_bytes(f.read(1), 'big')
-        code_bytes = f.read((code_length + 7) // 8)
+        symbol, code_length = read_exact(f, 2)
+        code_bytes = read_exact(f, (code_length + 7) // 8)
         code = bin(int.from_bytes(code_bytes, 'big'))[2:].zfill(code_length)
         code_table[code] = symbol
 
     return file_extension, code_table
 
 
-def decompress_data(binary_data, code_table):
-    result = bytearray()
-    code = ""
-    for bit in binary_data:
-        code += bit
-        if code in code_table:
-            result.append(code_table[code])
-            code = ""
+def build_decode_table(codes, bits=DECODE_TABLE_BITS):
+    """Таблица поиска по первым bits битам потока.
+
+    codes — последовательность (символ, код, длина). Элемент таблицы —
+    (символ, длина) для кодов не длиннее bits; для более длинных кодов —
+    (вторичная таблица, -число её бит); (None, 0) — недопустимый префикс.
+    """
+    table = [(None, 0)] * (1 << bits)
+    long_codes = {}
+    for symbol, code, length in codes:
+        if length <= bits:
+            first = code << (bits - length)
+            span = 1 << (bits - length)
+            table[first:first + span] = [(symbol, length)] * span
+        else:
+            rest = length - bits
+            long_codes.setdefault(code >> rest, []).append((symbol, code & ((1 << rest) - 1), rest))
+    for prefix, sub_codes in long_codes.items():
+        sub_bits = min(bits, max(length for _, _, length in sub_codes))
+        table[prefix] = (build_decode_table(sub_codes, sub_bits), -sub_bits)
+    return table
+
+
+def build_multi_symbol_table(table, bits=DECODE_TABLE_BITS, typecode='B'):
+    """Для каждого окна из bits бит — все символы, целиком лежащие в окне, и их суммарная длина."""
+    mask = (1 << bits) - 1
+    multi = []
+    for window in range(1 << bits):
+        symbols = array(typecode)
+        used = 0
+        while True:
+            symbol, length = table[(window << used) & mask]
+            if length <= 0 or used + length > bits:
+                break
+            symbols.append(symbol)
+            used += length
+        multi.append((symbols, used))
+    return multi
+
+
+# Построенные таблицы декодирования: их можно переиспользовать между потоками
+Decoder = namedtuple("Decoder", ["table", "multi", "max_length", "typecode"])
+
+
+@instrument.stage("build_decoder", data_arg=None, measure_output=False)
+def build_decoder(code_table, typecode='B'):
+    """Таблицы декодирования для таблицы {код: символ}; None для пустой таблицы."""
+    codes = [(symbol, int(code, 2), len(code)) for code, symbol in code_table.items()]
+    if not codes:
+        return None
+    table = build_decode_table(codes, DECODE_TABLE_BITS)
+    multi = build_multi_symbol_table(table, DECODE_TABLE_BITS, typecode)
+    return Decoder(table, multi, max(length for _, _, length in codes), typecode)
+
+
+def iter_decompress(chunks, bit_length, code_table, typecode='B', output_size=CHUNK_SIZE):
+    """Потоково декодирует bit_length бит из последовательности блоков байтов.
+
+    Символы — целые числа; выдаются части результата размером около
+    output_size символов: bytearray для typecode 'B' или array с
+    указанным typecode для больших алфавитов. Таблицы строятся один раз
+    (вместо code_table можно передать готовый Decoder), затем каждый
+    поиск выдаёт все символы окна.
+    """
+    if isinstance(code_table, Decoder):
+        decoder = code_table
+        typecode = decoder.typecode
+    else:
+        decoder = build_decoder(code_table, typecode)
+    if decoder is None or not bit_length:
+        return
+    bits = DECODE_TABLE_BITS
+    table, multi = decoder.table, decoder.multi
+    mask = (1 << bits) - 1
+    # В аккумуляторе всегда должно быть окно таблицы плюс самый длинный код
+    need = bits + decoder.max_length
+
+    chunks = iter(chunks)
+    data = b''
+    result = bytearray() if typecode == 'B' else array(typecode)
+    acc = 0
+    acc_bits = 0
+    pos = 0
+    taken = 0
+    total = 0
+    while taken < bit_length:
+        if acc_bits < need:
+            if len(data) - pos < 32 and chunks is not None:
+                data = data[pos:]
+                pos = 0
+                while len(data) < 32:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        chunks = None
+                        # Иначе повреждённая длина заставила бы декодировать нули без конца
+                        if bit_length > 8 * total:
+                            raise ValueError("Сжатые данные короче длины из заголовка")
+                        break
+                    total += len(chunk)
+                    data += chunk
+            if len(result) >= output_size:
+                yield result
+                result = bytearray() if typecode == 'B' else array(typecode)
+            # Подкачка по 32 байта; за концом данных дополняем нулями
+            chunk = data[pos:pos + 32]
+            pos += 32
+            acc = ((acc & ((1 << acc_bits) - 1)) << 256) | int.from_bytes(chunk, 'big') << (256 - 8 * len(chunk))
+            acc_bits += 256
+        window = (acc >> (acc_bits - bits)) & mask
+        symbols, used = multi[window]
+        if used and taken + used <= bit_length:
+            # Быстрый путь: несколько коротких кодов за один поиск
+            result += symbols
+            acc_bits -= used
+            taken += used
+            continue
+
+        # Медленный путь: длинный код через вторичные таблицы или хвост потока
+        symbol, length = table[window]
+        base, table_bits = 0, bits
+        while length < 0:
+            base += table_bits
+            table_bits = -length
+            window = (acc >> (acc_bits - base - table_bits)) & ((1 << table_bits) - 1)
+            symbol, length = symbol[window]
+        length += base
+        if length == base or taken + length > bit_length:
+            raise ValueError("Повреждённые сжатые данные")
+        result.append(symbol)
+        acc_bits -= length
+        taken += length
+    yield result
+
+
+@instrument.stage("decompress_data")
+def decompress_data(compressed_data, bit_length, code_table, typecode='B'):
+    """Декодирует упакованный поток целиком в памяти."""
+    if isinstance(code_table, Decoder):
+        typecode = code_table.typecode
+    result = bytearray() if typecode == 'B' else array(typecode)
+    for part in iter_decompress([compressed_data], bit_length, code_table, typecode):
+        result += part
     return result
 
 
-def compress_file(file_path):
-    data = read_file(file_path)
+# Обученная модель: отпечаток (он же идентификатор в потоке) и длины кодов
+HuffmanModel = namedtuple("HuffmanModel", ["model_id", "code_lengths"])
+# Таблицы, построенные по модели: коды, таблица кодирования и декодер
+ModelTables = namedtuple("ModelTables", ["code_table", "encode_table", "decoder"])
+
+# Модели, известные процессу: {отпечаток: HuffmanModel}
+_MODELS = {}
+
+
+def serialize_code_lengths(code_lengths):
+    f = io.BytesIO()
+    write_code_lengths(f, code_lengths)
+    return f.getvalue()
+
+
+def model_fingerprint(code_lengths):
+    """Отпечаток модели: начало SHA-256 от её длин кодов в формате заголовка."""
+    import hashlib
+
+    return hashlib.sha256(serialize_code_lengths(code_lengths)).digest()[:MODEL_ID_SIZE]
+
+
+def register_model(code_lengths):
+    model = HuffmanModel(model_fingerprint(code_lengths), dict(code_lengths))
+    _MODELS[model.model_id] = model
+    return model
+
+
+def train_model(samples, max_code_length=MAX_CODE_LENGTH):
+    """Обучает статическую модель на примерах сообщений (последовательность bytes).
+
+    Каждому из 256 значений байта добавляется единица частоты, чтобы модель
+    кодировала и символы, которых не было в обучающей выборке.
+    """
+    frequency_table = Counter(dict.fromkeys(range(256), 1))
+    for sample in samples:
+        frequency_table.update(build_frequency_table(sample))
+    return register_model(build_code_lengths(frequency_table, max_code_length))
+
+
+def save_model(model, path=None):
+    """Сохраняет модель; по умолчанию в MODEL_DIR под именем её отпечатка."""
+    if path is None:
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        path = os.path.join(MODEL_DIR, model.model_id.hex() + '.hfm')
+    with open(path, 'wb') as f:
+        f.write(MODEL_MAGIC)
+        f.write(model.model_id)
+        write_code_lengths(f, model.code_lengths)
+    return path
+
+
+def load_model(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MODEL_MAGIC)) != MODEL_MAGIC:
+            raise ValueError(f"Это не файл модели: {path}")
+        model_id = f.read(MODEL_ID_SIZE)
+        code_lengths = read_code_lengths(f)
+    if model_fingerprint(code_lengths) != model_id:
+        raise ValueError(f"Отпечаток модели не совпадает с её содержимым: {path}")
+    return register_model(code_lengths)
+
+
+def find_model(model_id):
+    """Модель по отпечатку: из загруженных в процесс или из каталога MODEL_DIR."""
+    model = _MODELS.get(model_id)
+    if model is None:
+        path = os.path.join(MODEL_DIR, model_id.hex() + '.hfm')
+        if not os.path.exists(path):
+            raise ValueError(f"Модель {model_id.hex()} не найдена")
+        model = load_model(path)
+    return model
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def model_tables(model_id):
+    """Таблицы кодирования и декодирования модели, построенные один раз на процесс."""
+    code_table = build_canonical_codes(find_model(model_id).code_lengths)
+    decoder = build_decoder({code: symbol for symbol, code in code_table.items()})
+    return ModelTables(code_table, build_encode_table(code_table), decoder)
+
+
+def write_model_header(f, model_id, file_extension, bit_length=0):
+    """Заголовок версии 5; возвращает позицию поля длины потока для дозаписи."""
+    f.write(MAGIC)
+    f.write(bytes([MODEL_FORMAT_VERSION]))
+    f.write(len(file_extension).to_bytes(1, 'big'))
+    f.write(file_extension.encode())
+    f.write(model_id)
+    position = f.tell()
+    f.write(bit_length.to_bytes(8, 'big'))
+    return position
+
+
+def compress_message(data, model=None, max_code_length=MAX_CODE_LENGTH):
+    """Сжимает сообщение в памяти.
+
+    С моделью в заголовке только ссылка на неё (версия 5), без модели
+    строится собственный код и пишется заголовок версии 3.
+    """
+    f = io.BytesIO()
+    if model is None:
+        code_table = build_canonical_codes(build_code_lengths(build_frequency_table(data), max_code_length))
+        compressed, bit_length = compress_data(data, code_table)
+        write_header(f, code_table, '', bit_length)
+        f.write(compressed)
+        return f.getvalue()
+    writer = BitWriter()
+    writer.write_symbols(data, model_tables(model.model_id).encode_table)
+    write_model_header(f, model.model_id, '', writer.bit_length)
+    f.write(writer.getvalue())
+    return f.getvalue()
+
+
+def decompress_message(compressed):
+    """Распаковывает сообщение в памяти (любая версия, кроме блочного контейнера)."""
+    f = io.BytesIO(compressed)
+    version, _, code_table, bit_length = load_header(f)
+    if version == BLOCK_FORMAT_VERSION:
+        raise ValueError("Блочный контейнер распаковывается через decompress_file")
+    if version == RANS_FORMAT_VERSION:
+        return b''.join(rans.iter_decode(f, code_table))
+    if version == PIPELINE_FORMAT_VERSION:
+        import pipeline
+
+        return b''.join(pipeline.iter_decoded(pipeline.iter_container_blocks(f), code_table))
+    return bytes(decompress_data(f.read(), bit_length, code_table))
+
+
+def iter_chunks(f, chunk_size=CHUNK_SIZE):
+    """Читает открытый файл блоками по chunk_size байтов."""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+@instrument.stage("compress_file", size=os.path.getsize)
+def compress_file(file_path, max_code_length=MAX_CODE_LENGTH, chunk_size=CHUNK_SIZE, index_interval=None,
+                  model=None, method='huffman', workers=1):
+    """Сжимает файл за два прохода блоками по chunk_size байтов.
+
+    Файл отображается в память (mmap): первый проход считает частоты
+    bincount прямо по отображению (при workers > 1 — параллельно по кускам),
+    второй кодирует из того же отображения и сразу пишет результат, поэтому
+    файл не копируется в память целиком. Если задан index_interval, в конец
+    файла пишется индекс: битовое смещение каждых index_interval исходных
+    байтов, по которому работает read_range.
+
+    С обученной моделью (model) проход подсчёта частот не нужен: файл
+    кодируется за один проход, а в заголовок пишется только ссылка на модель.
+    method='rans' вместо кода Хаффмана пишет поток rANS (версия 6),
+    method='bwt' — блоки конвейера BWT/MTF/RLE/Хаффман (версия 7).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Неизвестный метод сжатия: {method}")
+    if method == 'rans':
+        if model is not None or index_interval:
+            raise ValueError("rANS не поддерживает модели и индекс произвольного доступа")
+        return compress_file_rans(file_path, workers)
+    if method == 'bwt':
+        if model is not None or index_interval:
+            raise ValueError("Конвейер BWT не поддерживает модели и индекс произвольного доступа")
+        import pipeline
+
+        return pipeline.compress_file(file_path, workers=workers)
     file_extension = os.path.splitext(file_path)[1][1:]  # Extract extension without dot
-    frequency_table = build_frequency_table(data)
-    huffman_tree = build_huffman_tree(frequency_table)
-    code_table = build_huffman_codes(huffman_tree)
-    compressed_data = compress_data(data, code_table)
     compressed_file_path = os.path.splitext(file_path)[0] + ".bin"  # Save as .bin file
-    save_compressed_file(compressed_file_path, compressed_data, code_table, file_extension)
+    with map_file(file_path) as mapping:
+        if model is None:
+            frequency_table = frequencies_from_counts(count_file_symbols(file_path, mapping, workers))
+            code_lengths = build_code_lengths(frequency_table, max_code_length)
+            code_table = build_canonical_codes(code_lengths)
+            bit_length = sum(frequency_table[symbol] * length for symbol, length in code_lengths.items())
+            encode_table = build_encode_table(code_table)
+        else:
+            encode_table = model_tables(model.model_id).encode_table
+
+        with open(compressed_file_path, "wb") as out:
+            if model is None:
+                write_header(out, code_table, file_extension, bit_length)
+            else:
+                # Длина потока станет известна после кодирования: поле дописывается в конце
+                bit_length_position = write_model_header(out, model.model_id, file_extension)
+            writer = BitWriter()
+            index = encode_mapping(mapping, out, writer, encode_table, chunk_size, index_interval)
+            out.write(writer.getvalue())
+            if index_interval:
+                write_index(out, index, index_interval)
+            if model is not None:
+                out.seek(bit_length_position)
+                out.write(writer.bit_length.to_bytes(8, 'big'))
+    print(f"Файл сжат и сохранен как {compressed_file_path}")
+    return compressed_file_path
+
+
+@instrument.stage("encode_mapping", measure_output=False)
+def encode_mapping(mapping, out, writer, encode_table, chunk_size=CHUNK_SIZE, index_interval=None):
+    """Кодирует данные кусками по chunk_size прямо из буфера (срезы без копирования).
+
+    Возвращает точки индекса (пустой список без index_interval). Срезы живут
+    только внутри функции, так что отображение можно закрыть сразу после неё.
+    """
+    index = []
+    with memoryview(mapping) as data:
+        for position in range(0, len(data), chunk_size):
+            chunk = data[position:position + chunk_size]
+            if index_interval:
+                # Кодируем кусками, не пересекающими границы интервалов индекса
+                start = 0
+                while start < len(chunk):
+                    if (position + start) % index_interval == 0:
+                        index.append((position + start, writer.bit_length))
+                    end = min(len(chunk), start + index_interval - (position + start) % index_interval)
+                    writer.write_symbols(chunk[start:end], encode_table)
+                    start = end
+            else:
+                writer.write_symbols(chunk, encode_table)
+            chunk.release()
+            encoded = writer.drain()
+            out.write(encoded)
+            instrument.add_output(len(encoded))
+    return index
+
+
+def compress_file_rans(file_path, workers=1):
+    """Сжимает файл rANS: частоты первого прохода квантуются и пишутся в заголовок."""
+    file_extension = os.path.splitext(file_path)[1][1:]
+    compressed_file_path = os.path.splitext(file_path)[0] + ".bin"
+    with map_file(file_path) as mapping:
+        freqs = rans.quantize_frequencies(frequencies_from_counts(count_file_symbols(file_path, mapping, workers)))
+        with open(compressed_file_path, "wb") as out:
+            out.write(MAGIC)
+            out.write(bytes([RANS_FORMAT_VERSION]))
+            out.write(len(file_extension).to_bytes(1, 'big'))
+            out.write(file_extension.encode())
+            rans.write_frequencies(out, freqs)
+            with memoryview(mapping) as data:
+                rans.write_blocks(out, (data[i:i + rans.BLOCK_SIZE] for i in range(0, len(data), rans.BLOCK_SIZE)),
+                                  rans.build_tables(freqs))
     print(f"Файл сжат и сохранен как {compressed_file_path}")
     return compressed_file_path
 
-def decompress_file(file_path):
+
+def encode_block(block, shared_lengths, max_code_length=MAX_CODE_LENGTH):
+    """Кодирует блок вместе с заголовком блока.
+
+    Собственная таблица берётся, только если с её заголовком блок
+    получается короче, чем с общей таблицей.
+    """
+    frequency_table = build_frequency_table(block)
+    code_lengths = build_code_lengths(frequency_table, max_code_length)
+    table_header = io.BytesIO()
+    write_code_lengths(table_header, code_lengths)
+    table_bytes = table_header.getvalue()
+    bit_length = sum(frequency * code_lengths[symbol] for symbol, frequency in frequency_table.items())
+
+    flags = BLOCK_OWN_TABLE
+    if all(symbol in shared_lengths for symbol in frequency_table):
+        shared_bits = sum(frequency * shared_lengths[symbol] for symbol, frequency in frequency_table.items())
+        if (shared_bits + 7) // 8 <= len(table_bytes) + (bit_length + 7) // 8:
+            flags, code_lengths, table_bytes, bit_length = 0, shared_lengths, b'', shared_bits
+
+    compressed_data, bit_length = compress_data(block, build_canonical_codes(code_lengths))
+    padding_length = (8 - bit_length % 8) % 8
+    return b''.join([
+        bytes([flags]),
+        len(block).to_bytes(4, 'big'),
+        (len(table_bytes) + len(compressed_data)).to_bytes(4, 'big'),
+        bytes([padding_length]),
+        table_bytes,
+        compressed_data,
+    ])
+
+
+def decode_block(block_header, body, shared_table):
+    """Декодирует тело блока по его заголовку (флаги, размеры, дополнение)."""
+    flags = block_header[0]
+    uncompressed_size = int.from_bytes(block_header[1:5], 'big')
+    padding_length = block_header[9]
+    f = io.BytesIO(body)
+    code_table = shared_table
+    if flags & BLOCK_OWN_TABLE:
+        code_table = {code: symbol for symbol, code in build_canonical_codes(read_code_lengths(f)).items()}
+    payload = body[f.tell():]
+    result = decompress_data(payload, len(payload) * 8 - padding_length, code_table)
+    if len(result) != uncompressed_size:
+        raise ValueError("Размер распакованного блока не совпадает с заголовком")
+    return result
+
+
+def _decode_block_item(item, shared_table):
+    return decode_block(*item, shared_table)
+
+
+def parallel_map(function, items, workers):
+    """Упорядоченный map в пуле процессов; в работе не больше 2 * workers заданий."""
+    if workers == 1:
+        yield from map(function, items)
+        return
+    # Пул процессов тянет за собой multiprocessing: импорт - только когда он нужен
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(function, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def compress_file_blocks(file_path, block_size=BLOCK_SIZE, workers=None, max_code_length=MAX_CODE_LENGTH):
+    """Сжимает файл в блочный контейнер, кодируя блоки параллельно в пуле процессов.
+
+    Первый проход параллельно считает частоты для общей таблицы, второй
+    кодирует блоки независимо друг от друга.
+    """
+    workers = workers or os.cpu_count()
+    file_extension = os.path.splitext(file_path)[1][1:]
+    frequency_table = Counter()
     with open(file_path, "rb") as f:
-        file_extension, code_table = load_code_table(f)
-        padding_length = int.from_bytes(f.read(1), 'big')
-        compressed_data_length = int.from_bytes(f.read(4), 'big')
-        compressed_data = f.read()
+        for block_frequencies in parallel_map(build_frequency_table, iter_chunks(f, block_size), workers):
+            frequency_table.update(block_frequencies)
+    shared_lengths = build_code_lengths(frequency_table, max_code_length)
 
-        # Convert bytes to binary string, then truncate padding
-        binary_data = ''.join(f'{byte:08b}' for byte in compressed_data)
-        binary_data = binary_data[:compressed_data_length - padding_length]
+    compressed_file_path = os.path.splitext(file_path)[0] + ".bin"
+    encode = partial(encode_block, shared_lengths=shared_lengths, max_code_length=max_code_length)
+    with open(file_path, "rb") as f, open(compressed_file_path, "wb") as out:
+        write_header(out, build_canonical_codes(shared_lengths), file_extension, version=BLOCK_FORMAT_VERSION)
+        for encoded_block in parallel_map(encode, iter_chunks(f, block_size), workers):
+            out.write(encoded_block)
+        # Пустой блок отмечает конец контейнера
+        out.write(bytes(10))
+    print(f"Файл сжат и сохранен как {compressed_file_path}")
+    return compressed_file_path
+
+
+def iter_blocks(f):
+    """Читает блоки контейнера: (заголовок блока, тело) до завершающего пустого блока."""
+    while True:
+        block_header = f.read(10)
+        if len(block_header) < 10:
+            raise ValueError("Блочный контейнер обрывается без завершающего блока")
+        if not int.from_bytes(block_header[1:5], 'big'):
+            return
+        yield block_header, f.read(int.from_bytes(block_header[5:9], 'big'))
 
-        decompressed_data = decompress_data(binary_data, code_table)
 
-    decompressed_file_path = file_path.replace(".bin", f"_decompressed.{file_extension}")
-    with open(decompressed_file_path, "wb") as f:
-        f.write(decompressed_data)
+@instrument.stage("decompress_file", size=os.path.getsize)
+def decompress_file(file_path, chunk_size=CHUNK_SIZE, workers=None):
+    with open(file_path, "rb") as f:
+        version, file_extension, code_table, bit_length = load_header(f)
+        if version == BLOCK_FORMAT_VERSION:
+            decode = partial(_decode_block_item, shared_table=code_table)
+            parts = parallel_map(decode, iter_blocks(f), workers or os.cpu_count())
+        elif version == RANS_FORMAT_VERSION:
+            parts = rans.iter_decode(f, code_table)
+        elif version == PIPELINE_FORMAT_VERSION:
+            import pipeline
+
+            parts = pipeline.iter_decoded(pipeline.iter_container_blocks(f), code_table, workers or 1)
+        else:
+            parts = iter_decompress(iter_chunks(f, chunk_size), bit_length, code_table, output_size=chunk_size)
+        decompressed_file_path = file_path.replace(".bin", f"_decompressed.{file_extension}")
+        with open(decompressed_file_path, "wb") as out:
+            write_parts(parts, out)
     print(f"Файл расшифрован и сохранен как {decompressed_file_path}")
+    return decompressed_file_path
+
+
+@instrument.stage("decode", data_arg=None, measure_output=False)
+def write_parts(parts, out):
+    """Пишет распакованные части: декодирование идёт в генераторе parts, то есть здесь."""
+    for part in parts:
+        out.write(part)
+        instrument.add_output(len(part))
+
+
+def benchmark_workers(file_path, worker_counts=(1, 2, 4, 8), block_size=BLOCK_SIZE):
+    """Скорость блочного сжатия и распаковки (МБ/с) в зависимости от числа процессов."""
+    size = os.path.getsize(file_path)
+    results = []
+    for workers in worker_counts:
+        start = time.perf_counter()
+        compressed_file_path = compress_file_blocks(file_path, block_size, workers)
+        encode_time = time.perf_counter() - start
+        start = time.perf_counter()
+        decompress_file(compressed_file_path, workers=workers)
+        decode_time = time.perf_counter() - start
+        results.append({
+            "workers": workers,
+            "encode_mb_s": size / encode_time / 1e6,
+            "decode_mb_s": size / decode_time / 1e6,
+        })
+        print(f"Процессов: {workers}: сжатие {size / encode_time / 1e6:.2f} МБ/с, "
+              f"распаковка {size / decode_time / 1e6:.2f} МБ/с")
+    return results
+
+
+def write_index(f, index, index_interval):
+    """Индекс: пары (исходное смещение, битовое смещение), затем интервал, число пар и признак."""
+    for offset, bit_offset in index:
+        f.write(offset.to_bytes(8, 'big'))
+        f.write(bit_offset.to_bytes(8, 'big'))
+    f.write(index_interval.to_bytes(4, 'big'))
+    f.write(len(index).to_bytes(4, 'big'))
+    f.write(INDEX_MAGIC)
+
+
+def read_index(f, payload_end):
+    """Читает индекс из конца файла; None, если индекса нет."""
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    if file_size - payload_end < 12:
+        return None
+    f.seek(file_size - 12)
+    trailer = f.read(12)
+    count = int.from_bytes(trailer[4:8], 'big')
+    if trailer[8:] != INDEX_MAGIC or payload_end + 16 * count + 12 != file_size:
+        return None
+    f.seek(payload_end)
+    raw = f.read(16 * count)
+    return [(int.from_bytes(raw[i:i + 8], 'big'), int.from_bytes(raw[i + 8:i + 16], 'big'))
+            for i in range(0, len(raw), 16)]
+
+
+def read_range(file_path, offset, length):
+    """Возвращает length исходных байтов начиная с offset, декодируя только нужный участок.
+
+    Для файлов с индексом декодирование начинается с ближайшей точки
+    индекса, в блочном контейнере — с блока, содержащего offset. Без
+    индекса поток декодируется с начала, но без записи лишнего на диск.
+    """
+    with open(file_path, "rb") as f:
+        version, file_extension, code_table, bit_length = load_header(f)
+        if version == BLOCK_FORMAT_VERSION:
+            return _read_range_blocks(f, code_table, offset, length)
+        payload_start = f.tell()
+        index = read_index(f, payload_start + (bit_length + 7) // 8) if version in (3, MODEL_FORMAT_VERSION) else None
+        start_offset, start_bit, end_bit = 0, 0, bit_length
+        if index:
+            for entry_offset, entry_bit in index:
+                if entry_offset <= offset:
+                    start_offset, start_bit = entry_offset, entry_bit
+                elif entry_offset >= offset + length:
+                    end_bit = entry_bit
+                    break
+            # Участок потока выравнивается так, чтобы он начинался с границы байта
+            f.seek(payload_start + start_bit // 8)
+            span = f.read((end_bit + 7) // 8 - start_bit // 8)
+            skip_bits = start_bit % 8
+            aligned = ((int.from_bytes(span, 'big') << skip_bits) & ((1 << 8 * len(span)) - 1)).to_bytes(len(span), 'big')
+            decoded = decompress_data(aligned, end_bit - start_bit, code_table)
+            return bytes(decoded[offset - start_offset:offset - start_offset + length])
+
+        f.seek(payload_start)
+        if version == RANS_FORMAT_VERSION:
+            parts = rans.iter_decode(f, code_table)
+        elif version == PIPELINE_FORMAT_VERSION:
+            import pipeline
+
+            parts = pipeline.iter_decoded(pipeline.iter_container_blocks(f), code_table)
+        else:
+            parts = iter_decompress(iter_chunks(f), bit_length, code_table)
+        result = bytearray()
+        position = 0
+        for part in parts:
+            if position + len(part) > offset:
+                result += part[max(offset - position, 0):offset + length - position]
+            position += len(part)
+            if position >= offset + length:
+                break
+        return bytes(result)
+
+
+def _read_range_blocks(f, shared_table, offset, length):
+    result = bytearray()
+    position = 0
+    while position < offset + length:
+        block_header = f.read(10)
+        uncompressed_size = int.from_bytes(block_header[1:5], 'big')
+        compressed_size = int.from_bytes(block_header[5:9], 'big')
+        if not uncompressed_size:
+            break
+        if position + uncompressed_size <= offset:
+            # Блок целиком до нужного участка: пропускаем его не читая
+            f.seek(compressed_size, os.SEEK_CUR)
+        else:
+            block = decode_block(block_header, f.read(compressed_size), shared_table)
+            result += block[max(offset - position, 0):offset + length - position]
+        position += uncompressed_size
+    return bytes(result)
 
 
 def read_file(file_path):
@@ -124,26 +1126,14 @@ def read_file(file_path):
 
 
 if __name__ == "__main__":
-    import time
-
     name = input('Имя файла: ')
     name_bin = os.path.splitext(name)[0]
     original_size = os.path.getsize(name)
-    start_time = time.time()
-    path_bin = compress_file(name)
-    end_time = time.time() - start_time
-    compressed_size = os.path.getsize(path_bin)
-    compression_ratio = original_size / compressed_size
-
-    if compressed_size >= original_size:
-        efficiency = 0
-    else:
-        efficiency = (1 - compressed_size / original_size) * 100
-
-    print(f"Исходный размер: {original_size} байт")
-    print(f"Закодированный размер: {compressed_size} байт")
-    print(f"Коэффициент сжатия: {compression_ratio:.2f}")
-    print(f"Относительная эффективность: {efficiency:.2f}%")
-    print(f"Время за которое выполнялась программа: {end_time} секунд")
-
-    decompress_file(f"{name_bin}.bin")
+    # Время по стадиям; INSTRUMENT_MODE=memory,profile и INSTRUMENT_OUTPUT=путь.json - подробнее
+    with instrument.collect_from_env() as collector:
+        start_time = time.perf_counter()
+        path_bin = compress_file(name)
+        end_time = time.perf_counter() - start_time
+        decompress_file(f"{name_bin}.bin")
+    print_report(original_size, os.path.getsize(path_bin), end_time)
+    instrument.print_stats(collector)
@@ -0,0 +1,224 @@
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+# Инструментирование стадий кодеков.
+# Функции-стадии помечаются декоратором stage. Пока сборщик не подключён
+# (collect), обёртка сразу вызывает функцию. Подключённый сборщик получает
+# по записи на вызов стадии: длительность, байты на входе и выходе и прирост
+# числа выделенных блоков памяти; в режиме memory - ещё пик tracemalloc,
+# в режиме profile для стадий собирается профиль cProfile.
+# Состояние глобальное для процесса: стадии в пуле процессов не учитываются.
+# cProfile, pstats и json импортируются только в режимах, где нужны: модуль
+# импортируют все кодеки, и он не должен удлинять их запуск.
+
+# Переменные окружения для интерактивных режимов модулей:
+# режимы через запятую (memory, profile) и путь для JSON-отчёта
+MODE_ENV = "INSTRUMENT_MODE"
+OUTPUT_ENV = "INSTRUMENT_OUTPUT"
+# Сколько самых дорогих функций профиля стадии попадает в отчёт
+PROFILE_TOP = 15
+
+_session = None
+
+
+class StatsCollector:
+    """Сборщик по умолчанию: хранит записи вызовов и сводит их по стадиям.
+
+    Годится любой объект с методом record(entry); record_profile(stage, stats)
+    нужен только для режима profile.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.profiles = {}
+
+    def record(self, entry):
+        self.records.append(entry)
+
+    def record_profile(self, stage_name, stats):
+        self.profiles[stage_name] = stats
+
+    def summary(self):
+        """Итоги по стадиям в порядке первого вызова; байты None, если стадия их не мерит."""
+        stages = {}
+        for entry in self.records:
+            total = stages.setdefault(entry["stage"], {"calls": 0, "seconds": 0.0, "bytes_in": None,
+                                                       "bytes_out": None, "allocated_blocks": 0})
+            total["calls"] += 1
+            total["seconds"] += entry["seconds"]
+            total["allocated_blocks"] += entry["allocated_blocks"]
+            for key in ("bytes_in", "bytes_out"):
+                if entry[key] is not None:
+                    total[key] = (total[key] or 0) + entry[key]
+            if "peak_bytes" in entry:
+                total["peak_bytes"] = max(total.get("peak_bytes", 0), entry["peak_bytes"])
+        return stages
+
+    def profile_report(self, top=PROFILE_TOP):
+        """Для каждой стадии - top функций по накопленному времени."""
+        report = {}
+        for stage_name, stats in self.profiles.items():
+            rows = []
+            for (file_name, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+                rows.append({"function": f"{os.path.basename(file_name)}:{line}({function})", "calls": calls,
+                             "tottime": tottime, "cumtime": cumtime})
+            report[stage_name] = sorted(rows, key=lambda row: row["cumtime"], reverse=True)[:top]
+        return report
+
+    def to_json(self):
+        return {"stages": self.summary(), "records": self.records, "profiles": self.profile_report()}
+
+    def save(self, path):
+        import json
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2, ensure_ascii=False)
+
+
+def data_size(value):
+    """Размер данных в байтах: буферы, строки (в UTF-8) и пары (данные, длина в битах).
+
+    Для остальных значений (таблицы, деревья) - None.
+    """
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, tuple) and value:
+        return data_size(value[0])
+    try:
+        with memoryview(value) as view:
+            return view.nbytes
+    except TypeError:
+        return None
+
+
+def stage(name, data_arg=0, measure_output=True, size=data_size):
+    """Декоратор стадии: data_arg - номер аргумента с входными данными (None - не мерить),
+    measure_output - считать ли результат выходными данными, size - чем мерить
+    вход и результат (для стадий над файлами - os.path.getsize по путям).
+
+    Стадия, которая пишет результат по частям, сообщает его размер через
+    add_output. Рекурсивный или вложенный вызов той же стадии отдельно не записывается.
+    """
+
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _session is None or name in _session["active"]:
+                return function(*args, **kwargs)
+            return _measure(name, function, args, kwargs, data_arg, measure_output, size)
+
+        return wrapper
+
+    return decorate
+
+
+def add_output(size):
+    """Добавляет size байтов к выходу текущей (самой вложенной) стадии."""
+    if _session is not None and _session["written"]:
+        _session["written"][-1] = (_session["written"][-1] or 0) + size
+
+
+def _measure(name, function, args, kwargs, data_arg, measure_output, size):
+    session = _session
+    active = session["active"]
+    outermost = not active
+    active.append(name)
+    session["written"].append(None)
+    profiler = None
+    if session["profile"] and outermost:
+        import cProfile
+
+        # Профилировщик один на процесс: вложенные стадии входят в профиль внешней
+        profiler = session["profilers"].setdefault(name, cProfile.Profile())
+    if session["memory"]:
+        start_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        seconds = time.perf_counter() - start
+        allocated_blocks = sys.getallocatedblocks() - blocks
+        active.pop()
+        written = session["written"].pop()
+    if written is None and measure_output:
+        written = size(result)
+    entry = {
+        "stage": name,
+        "seconds": seconds,
+        "bytes_in": size(args[data_arg]) if data_arg is not None and data_arg < len(args) else None,
+        "bytes_out": written,
+        "allocated_blocks": allocated_blocks,
+    }
+    if session["memory"]:
+        # reset_peak во вложенной стадии сбрасывает и пик внешней: он поднимается по стеку
+        peak = max(tracemalloc.get_traced_memory()[1], session["peaks"].pop(len(active) + 1, 0))
+        if active:
+            session["peaks"][len(active)] = max(session["peaks"].get(len(active), 0), peak)
+        entry["peak_bytes"] = peak - start_memory
+    session["collector"].record(entry)
+    return result
+
+
+@contextmanager
+def collect(collector=None, memory=False, profile=False, output=None):
+    """Подключает сборщик (по умолчанию StatsCollector) на время блока with.
+
+    memory включает tracemalloc, profile - cProfile по стадиям; с output
+    отчёт сборщика по выходе сохраняется в JSON. Оба режима заметно
+    замедляют стадии с циклами на Python (tracemalloc - в разы), так что
+    время в них сравнимо только с прогонами в том же режиме.
+    """
+    global _session
+    if _session is not None:
+        raise ValueError("Сборщик статистики уже подключён")
+    collector = collector if collector is not None else StatsCollector()
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _session = {"collector": collector, "memory": memory, "profile": profile, "active": [], "written": [],
+                "peaks": {}, "profilers": {}}
+    try:
+        yield collector
+    finally:
+        profilers = _session["profilers"]
+        _session = None
+        if started_tracing:
+            tracemalloc.stop()
+        record_profile = getattr(collector, "record_profile", None)
+        if record_profile is not None and profilers:
+            import pstats
+
+            for name, profiler in profilers.items():
+                record_profile(name, pstats.Stats(profiler))
+        if output:
+            collector.save(output)
+
+
+def collect_from_env(collector=None):
+    """collect с режимами из INSTRUMENT_MODE и путём отчёта из INSTRUMENT_OUTPUT."""
+    modes = {mode.strip() for mode in os.environ.get(MODE_ENV, "").split(",") if mode.strip()}
+    unknown = modes - {"memory", "profile"}
+    if unknown:
+        raise ValueError(f"Неизвестные режимы инструментирования: {', '.join(sorted(unknown))}")
+    return collect(collector, "memory" in modes, "profile" in modes, os.environ.get(OUTPUT_ENV))
+
+
+def print_stats(collector):
+    """Таблица по стадиям: вызовы, время, байты на входе и выходе, память."""
+    print(f"{'Стадия':24} {'вызовов':>8} {'время, с':>10} {'вход, байт':>12} {'выход, байт':>12} "
+          f"{'блоков':>9} {'пик, КиБ':>9}")
+    for name, total in collector.summary().items():
+        bytes_in, bytes_out = (total[key] if total[key] is not None else '-' for key in ("bytes_in", "bytes_out"))
+        peak = total['peak_bytes'] >> 10 if "peak_bytes" in total else '-'
+        print(f"{name:24} {total['calls']:>8} {total['seconds']:>10.4f} {bytes_in:>12} "
+              f"{bytes_out:>12} {total['allocated_blocks']:>9} {peak:>9}")
@@ -1,25 +1,87 @@
+import io
+import os
+from array import array
+
+import numpy as np
+
+# Заголовок файла чётности: признак, версия, затем параметры кода и размер данных
+PARITY_MAGIC = b'RSPF'
+PARITY_VERSION = 1
+# Сколько кодовых слов перемежаются побайтно: пакет ошибок длиной до
+# INTERLEAVE_DEPTH * t байтов даёт не больше t ошибок в каждом слове
+INTERLEAVE_DEPTH = 64
+# Сколько байтов данных (целыми группами перемежения) обрабатывается за один векторный проход
+BATCH_BYTES = 1 << 20
+# Примитивные многочлены полей GF(2^8) и GF(2^16)
+GF256_POLYNOMIAL = 0x11d
+GF65536_POLYNOMIAL = 0x1100b
+# Полная таблица умножения строится только для полей не больше этого:
+# для GF(2^16) она заняла бы 8 ГБ, там умножение идёт через логарифмы
+MUL_TABLE_LIMIT = 256
+# Коды для сравнения полей при одинаковой избыточности (n - k) / n = 32/255:
+# (размер поля, n, k)
+FIELD_BENCHMARK_CODES = ((256, 255, 223), (65536, 2040, 1784), (65536, 16320, 14272))
+
+# Порождающие многочлены и таблицы чётности, общие для всех кодов с теми же параметрами
+_GENERATOR_CACHE = {}
+_PARITY_CACHE = {}
+
+
 class GaloisField:
+    """Поле GF(2^m) для m <= 16.
+
+    Таблицы степеней и логарифмов хранятся компактно: array для скалярных
+    операций и массивы NumPy для векторных. Символы поля - uint8 для
+    GF(256) и uint16 для больших полей.
+    """
+
     def __init__(self, field_size, primitive_polynomial):
+        if field_size & (field_size - 1) or not 2 < field_size <= 1 << 16:
+            raise ValueError("Поддерживаются поля GF(2^m) размером до 2^16")
+        # Многочлен степени ровно m: иначе степени alpha выходят за символы поля
+        if primitive_polynomial >> (field_size.bit_length() - 1) != 1:
+            raise ValueError(f"Степень многочлена {primitive_polynomial:#x} не равна степени поля")
         self.field_size = field_size
         self.primitive_polynomial = primitive_polynomial
         self.alpha = 2
+        self.dtype = np.dtype(np.uint8 if field_size <= 256 else np.uint16)
+        # Порядок байтов символов в файлах: старший байт первым
+        self.stored_dtype = self.dtype.newbyteorder('>')
+        self.symbol_size = self.dtype.itemsize
         self.generate_tables()
 
     def generate_tables(self):
-        self.exp_table = [1] * (self.field_size * 2)
-        self.log_table = [0] * self.field_size
+        order = self.field_size - 1
+        self.exp_table = array('B' if self.symbol_size == 1 else 'H', bytes(self.symbol_size * 2 * self.field_size))
+        self.log_table = array('H', bytes(2 * self.field_size))
         x = 1
-        for i in range(self.field_size - 1):
+        for i in range(order):
             self.exp_table[i] = x
+            self.exp_table[i + order] = x
             self.log_table[x] = i
-            x = self.mul(x, self.alpha)
-        for i in range(self.field_size - 1, self.field_size * 2 - 1):
-            self.exp_table[i] = self.exp_table[i - (self.field_size - 1)]
+            x <<= 1
+            if x & self.field_size:
+                x ^= self.primitive_polynomial
+        if x != 1 or len(set(self.exp_table[:order])) != order:
+            raise ValueError("Многочлен не примитивен: степени alpha не покрывают поле")
+
+        # Векторные таблицы: логарифм нуля - метка 2 * order, сумма логарифмов
+        # с ней попадает в нулевую часть exp, поэтому произведения считаются
+        # без проверки на ноль: exp[log[a] + log[b]]
+        self.exp = np.zeros(4 * order + 1, dtype=self.dtype)
+        self.exp[:2 * order] = np.frombuffer(self.exp_table, dtype=self.dtype)[:2 * order]
+        self.log = np.frombuffer(self.log_table, dtype=np.uint16).astype(np.int32)
+        self.log[0] = 2 * order
+        self.mul_table = None
+        if self.field_size <= MUL_TABLE_LIMIT:
+            logs = self.log[1:]
+            self.mul_table = np.zeros((self.field_size, self.field_size), dtype=self.dtype)
+            self.mul_table[1:, 1:] = self.exp[logs[:, None] + logs[None, :]]
 
     def mul(self, a, b):
         if a == 0 or b == 0:
             return 0
-        return self.exp_table[(self.log_table[a] + self.log_table[b]) % (self.field_size - 1)]
+        return self.exp_table[self.log_table[a] + self.log_table[b]]
 
     def div(self, a, b):
         if b == 0:
@@ -31,88 +93,574 @@ class GaloisField:
     def add(self, a, b):
         return a ^ b
 
+    def pow(self, x, power):
+        """x в степени power в поле (а не целочисленное возведение в степень)."""
+        if x == 0:
+            return 0 if power else 1
+        return self.exp_table[(self.log_table[x] * power) % (self.field_size - 1)]
+
+    def mul_scalar(self, vector, scalar):
+        """Вектор, умноженный на элемент поля."""
+        if self.mul_table is not None:
+            return self.mul_table[scalar][vector]
+        return self.exp[self.log[vector] + self.log[scalar]]
+
+    def mul_vectors(self, a, b):
+        """Поэлементное произведение двух векторов (с транслированием форм)."""
+        if self.mul_table is not None:
+            return self.mul_table[a, b]
+        return self.exp[self.log[a] + self.log[b]]
+
+    def div_vectors(self, a, b):
+        """Поэлементное частное; делители должны быть ненулевыми."""
+        a = np.asarray(a)
+        quotient = self.exp[(self.log[a] - self.log[np.asarray(b)]) % (self.field_size - 1)]
+        return np.where(a == 0, 0, quotient).astype(self.exp.dtype)
+
     def evaluate_polynomial(self, poly, x):
-        result = 0
+        """Значение многочлена (старший коэффициент первым) по схеме Горнера.
+
+        x может быть числом или массивом точек — тогда многочлен
+        вычисляется во всех точках сразу.
+        """
+        x = np.asarray(x, dtype=self.dtype)
+        result = np.zeros_like(x)
         for coeff in poly:
-            result = self.add(result, self.mul(coeff, x))
-        return result
+            result = self.mul_vectors(result, x) ^ coeff
+        return result if result.ndim else int(result)
+
+    def to_symbols(self, data):
+        """Байты -> массив символов поля (для GF(2^16) - пары байтов, старший первым)."""
+        return np.frombuffer(data, dtype=self.stored_dtype).astype(self.dtype)
+
+    def to_bytes(self, symbols):
+        return np.asarray(symbols).astype(self.stored_dtype).tobytes()
 
 
 class ReedSolomon:
     def __init__(self, n, k, field):
+        if not 0 < k < n < field.field_size:
+            raise ValueError(f"Код RS({n}, {k}) невозможен в GF({field.field_size}): нужно 0 < k < n < {field.field_size}")
         self.n = n
         self.k = k
         self.t = (n - k) // 2
         self.field = field
+        self.dtype = field.dtype
+        self.syndrome_powers = None
+        if field.mul_table is not None:
+            # Степени alpha^(i*(n-1-j)) для синдромов: строка i — корень alpha^i,
+            # столбец j — позиция (коэффициенты идут от старшего к младшему).
+            # Для длинных слов матрица (n-k) x n слишком велика: там схема Горнера
+            powers = np.outer(np.arange(self.n - self.k), np.arange(self.n - 1, -1, -1)) % (field.field_size - 1)
+            self.syndrome_powers = field.exp[powers]
 
     def encode(self, message):
-        message_poly = [ord(c) for c in message] + [0] * (self.n - len(message))
+        message_poly = [ord(c) for c in message] + [0] * (self.k - len(message))
         generator_poly = self.generator_polynomial()
-        encoded = self.polynomial_division(message_poly, generator_poly)[1]
-        return message_poly + encoded
+        encoded = self.polynomial_division(message_poly + [0] * (self.n - self.k), generator_poly)[1]
+        return message_poly + encoded.tolist()
 
     def generator_polynomial(self):
-        g = [1]
-        for i in range(self.t):
-            g = self.polynomial_multiply(g, [1, self.field.alpha ** (i)])
-        return g
+        key = (self.field.field_size, self.field.primitive_polynomial, self.n - self.k)
+        if key not in _GENERATOR_CACHE:
+            g = np.array([1], dtype=self.dtype)
+            for i in range(self.n - self.k):
+                g = self.polynomial_multiply(g, [1, self.field.pow(self.field.alpha, i)])
+            _GENERATOR_CACHE[key] = g
+        return _GENERATOR_CACHE[key]
+
+    def parity_tables(self):
+        """Таблицы для матричного кодирования: [i][v] — вклад символа v на позиции i в чётность.
+
+        Чётность линейна по сообщению, строка i матрицы — остаток от деления
+        x^(n-1-i) на порождающий многочлен. Остатки получаются один из другого
+        как в LFSR: сдвиг и вычитание старшего коэффициента, умноженного на g.
+        """
+        key = (self.field.field_size, self.field.primitive_polynomial, self.n, self.k)
+        if key not in _PARITY_CACHE:
+            g_tail = self.generator_polynomial()[1:]
+            rows = np.empty((self.k, self.n - self.k), dtype=self.dtype)
+            remainder = g_tail.copy()  # остаток от x^(n-k)
+            for i in range(self.k - 1, -1, -1):
+                rows[i] = remainder
+                lead = remainder[0]
+                remainder = np.append(remainder[1:], 0).astype(self.dtype) ^ self.field.mul_scalar(g_tail, lead)
+            _PARITY_CACHE[key] = self.field.mul_table[:, rows].transpose(1, 0, 2).copy()
+        return _PARITY_CACHE[key]
+
+    def encode_blocks(self, messages):
+        """Чётность сразу для многих сообщений: массив (число слов, k) -> (число слов, n-k)."""
+        messages = np.asarray(messages, dtype=self.dtype)
+        if self.field.mul_table is None:
+            return self.encode_blocks_lfsr(messages)
+        tables = self.parity_tables()
+        parity = np.zeros((len(messages), self.n - self.k), dtype=self.dtype)
+        for i in range(self.k):
+            parity ^= tables[i][messages[:, i]]
+        return parity
+
+    def encode_blocks_lfsr(self, messages):
+        """Чётность делением в LFSR, векторно по словам: для больших полей без таблиц.
+
+        Остаток хранится кольцом: вместо сдвига на каждом шаге движется
+        номер его старшего коэффициента.
+        """
+        field = self.field
+        m = self.n - self.k
+        log_g = field.log[self.generator_polynomial()[1:]]
+        ring = np.zeros((len(messages), m), dtype=self.dtype)
+        head = 0
+        for i in range(self.k):
+            feedback = messages[:, i] ^ ring[:, head]
+            ring[:, head] = 0
+            head = (head + 1) % m
+            product = field.exp[field.log[feedback][:, None] + log_g[None, :]]
+            ring[:, head:] ^= product[:, :m - head]
+            ring[:, :head] ^= product[:, m - head:]
+        return np.roll(ring, -head, axis=1)
 
     def polynomial_multiply(self, poly1, poly2):
-        result = [0] * (len(poly1) + len(poly2) - 1)
-        for i in range(len(poly1)):
-            for j in range(len(poly2)):
-                result[i + j] = self.field.add(result[i + j], self.field.mul(poly1[i], poly2[j]))
+        poly1 = np.asarray(poly1, dtype=self.dtype)
+        poly2 = np.asarray(poly2, dtype=self.dtype)
+        result = np.zeros(len(poly1) + len(poly2) - 1, dtype=self.dtype)
+        # Сдвинутые копии poly2, умноженные на каждый коэффициент poly1
+        for i, coeff in enumerate(poly1):
+            result[i:i + len(poly2)] ^= self.field.mul_scalar(poly2, coeff)
         return result
 
     def polynomial_division(self, dividend, divisor):
-        remainder = dividend[:]
-        while len(remainder) >= len(divisor):
-            factor = self.field.div(remainder[0], divisor[0])
-            for i in range(len(divisor)):
-                remainder[i] = self.field.add(remainder[i], self.field.mul(factor, divisor[i]))
-            remainder = remainder[1:]
-        return divisor, remainder
+        """Синтетическое деление; возвращает частное и остаток."""
+        remainder = np.array(dividend, dtype=self.dtype)
+        divisor = np.asarray(divisor, dtype=self.dtype)
+        steps = len(remainder) - len(divisor) + 1
+        for i in range(max(steps, 0)):
+            factor = self.field.div(int(remainder[i]), int(divisor[0]))
+            remainder[i] = factor
+            if factor:
+                remainder[i + 1:i + len(divisor)] ^= self.field.mul_scalar(divisor[1:], factor)
+        split = max(steps, 0)
+        return remainder[:split], remainder[split:]
 
-    def decode(self, received):
-        syndromes = self.compute_syndromes(received)
-        if all(s == 0 for s in syndromes):
-            return ''.join(chr(c) for c in received[:self.k])
+    def decode(self, received, erase_pos=()):
+        corrected, _ = self.decode_codeword(received, erase_pos)
+        return ''.join(chr(c) for c in corrected[:self.k])
 
+    def decode_codeword(self, received, erase_pos=()):
+        """Исправляет кодовое слово; erase_pos — заранее известные испорченные позиции.
 
-        error_locator, error_positions = self.find_errors(syndromes)
+        Возвращает исправленное слово и позиции исправленных символов.
+        Исправимо, пока 2 * ошибки + стирания <= n - k, иначе ValueError.
+        """
+        corrected = np.array(received, dtype=self.dtype)
+        syndromes = self.compute_syndromes(corrected)
+        if not any(syndromes):
+            return corrected, []
+        if len(erase_pos) > self.n - self.k:
+            raise ValueError("Слишком много стираний")
 
-        # Исправление ошибок
-        corrected_message = received[:]
-        for pos in error_positions:
-            corrected_message[pos] = self.field.add(corrected_message[pos], 1)  # Простейшее исправление ошибки
-        return ''.join(chr(c) for c in corrected_message[:self.k])
+        error_locator, error_positions = self.find_errors(syndromes, erase_pos)
+        corrected[error_positions] ^= self.error_magnitudes(syndromes, error_locator, error_positions)
+        if any(self.compute_syndromes(corrected)):
+            raise ValueError("Слишком много ошибок, исправление невозможно")
+        return corrected, error_positions.tolist()
 
     def compute_syndromes(self, received):
-        syndromes = []
-        for i in range(self.t):
-            syndrome = 0
-            for j in range(self.n):
-                power = (i * j) % (self.field.field_size - 1)
-                syndrome = self.field.add(syndrome, self.field.mul(received[j], self.field.alpha ** power))
-            syndromes.append(syndrome)
+        received = np.asarray(received, dtype=self.dtype)
+        if self.syndrome_powers is None:
+            return self.compute_syndromes_blocks(received[None, :])[0].tolist()
+        products = self.field.mul_table[received[None, :], self.syndrome_powers]
+        return np.bitwise_xor.reduce(products, axis=1).tolist()
+
+    def compute_syndromes_blocks(self, codewords):
+        """Синдромы сразу для многих слов: (число слов, n) -> (число слов, n-k)."""
+        codewords = np.asarray(codewords, dtype=self.dtype)
+        if self.field.mul_table is None:
+            return self.syndromes_horner(codewords)
+        tables = self.syndrome_tables()
+        syndromes = np.zeros((len(codewords), self.n - self.k), dtype=self.dtype)
+        for j in range(self.n):
+            syndromes ^= tables[j][codewords[:, j]]
         return syndromes
 
-    def find_errors(self, syndromes):
-        error_locator = [1]
-        for i in range(len(syndromes)):
-            delta = syndromes[i]
-            for j in range(1, len(error_locator)):
-                delta ^= self.field.mul(error_locator[-(j + 1)], syndromes[i - j])
-            if delta != 0:
-                error_locator.append(delta)
-        error_positions = [i for i in range(self.n) if
-                           self.field.evaluate_polynomial(error_locator, self.field.alpha ** i) == 0]
-        return error_locator, error_positions
+    def syndromes_horner(self, codewords):
+        """Синдромы схемой Горнера во всех корнях alpha^i сразу: S = S * alpha^i + r_j.
+
+        Логарифм alpha^i равен i, так что умножение на корни - один сдвиг
+        логарифмов; таблицы размером с поле не нужны.
+        """
+        field = self.field
+        roots_log = np.arange(self.n - self.k, dtype=np.int32)[None, :]
+        syndromes = np.zeros((len(codewords), self.n - self.k), dtype=self.dtype)
+        for j in range(self.n):
+            syndromes = field.exp[field.log[syndromes] + roots_log]
+            syndromes ^= codewords[:, j, None]
+        return syndromes
+
+    def syndrome_tables(self):
+        """[j][v] — вклад символа v на позиции j во все синдромы."""
+        if not hasattr(self, '_syndrome_tables'):
+            self._syndrome_tables = self.field.mul_table[:, self.syndrome_powers.T].transpose(1, 0, 2).copy()
+        return self._syndrome_tables
+
+    def position_powers(self, positions):
+        """alpha^(n-1-j) — локатор позиции j (коэффициенты идут от старшего к младшему)."""
+        return self.field.exp[(self.n - 1 - np.asarray(positions, dtype=np.int64)) % (self.field.field_size - 1)]
+
+    def find_errors(self, syndromes, erase_pos=()):
+        """Берлекэмп–Мэсси, начатый с многочлена стираний, и поиск Ченя.
+
+        Возвращает многочлен локаторов ошибок и стираний (младший
+        коэффициент первым) и массив позиций, где он обращается в ноль.
+        """
+        field = self.field
+        syndromes = np.asarray(syndromes, dtype=self.dtype)
+        erasures = len(erase_pos)
+
+        # Многочлен стираний: произведение (1 - X_e x) по известным позициям
+        locator = np.array([1], dtype=self.dtype)
+        for x in self.position_powers(list(erase_pos)):
+            locator = self.polynomial_multiply(locator, [1, x])
+        previous = locator.copy()
+        length, shift, last_delta = erasures, 1, 1
+        for step in range(erasures, self.n - self.k):
+            terms = min(len(locator), step + 1)
+            delta = int(np.bitwise_xor.reduce(field.mul_vectors(locator[:terms], syndromes[step::-1][:terms])))
+            if delta == 0:
+                shift += 1
+                continue
+            correction = np.concatenate((np.zeros(shift, dtype=self.dtype),
+                                         field.mul_scalar(previous, field.div(delta, last_delta))))
+            updated = np.zeros(max(len(locator), len(correction)), dtype=self.dtype)
+            updated[:len(locator)] = locator
+            updated[:len(correction)] ^= correction
+            if 2 * length <= step + erasures:
+                previous, length, last_delta, shift = locator, step + 1 + erasures - length, delta, 1
+            else:
+                shift += 1
+            locator = updated
+        locator = np.trim_zeros(locator, 'b')
+
+        # Поиск Ченя: корни многочлена — обратные к локаторам всех позиций сразу
+        inverse = field.exp[(field.field_size - 1 - (self.n - 1 - np.arange(self.n))) % (field.field_size - 1)]
+        values = field.evaluate_polynomial(locator[::-1], inverse)
+        error_positions = np.flatnonzero(values == 0)
+        if len(error_positions) != len(locator) - 1:
+            raise ValueError("Слишком много ошибок, исправление невозможно")
+        return locator, error_positions
+
+    def error_magnitudes(self, syndromes, error_locator, error_positions):
+        """Величины ошибок по алгоритму Форни: X * Omega(X^-1) / Lambda'(X^-1)."""
+        field = self.field
+        omega = self.polynomial_multiply(syndromes, error_locator)[:self.n - self.k]
+        # Формальная производная: в характеристике 2 остаются только нечётные степени
+        derivative = np.zeros(max(len(error_locator) - 1, 1), dtype=self.dtype)
+        derivative[::2] = error_locator[1::2]
+        x = self.position_powers(error_positions)
+        x_inverse = field.div_vectors(np.ones_like(x), x)
+        numerator = field.mul_vectors(x, field.evaluate_polynomial(omega[::-1], x_inverse))
+        return field.div_vectors(numerator, field.evaluate_polynomial(derivative[::-1], x_inverse))
+
+
+def deinterleave(data, rs, depth):
+    """Раскладывает данные группами по k * depth символов по кодовым словам.
+
+    Символ поля - байт или (для GF(2^16)) пара байтов. Символ b группы
+    попадает в слово b % depth на позицию b // depth; последняя группа
+    дополняется нулями, которые в файл не записываются.
+    """
+    field = rs.field
+    if len(data) % field.symbol_size:
+        data = bytes(data) + bytes(field.symbol_size - len(data) % field.symbol_size)
+    symbols = field.to_symbols(data)
+    group_size = rs.k * depth
+    groups = -(-len(symbols) // group_size)
+    buffer = np.zeros(groups * group_size, dtype=field.dtype)
+    buffer[:len(symbols)] = symbols
+    return buffer.reshape(groups, rs.k, depth).transpose(0, 2, 1).reshape(groups * depth, rs.k)
+
+
+def interleave(messages, rs, depth, size):
+    """Обратное к deinterleave: первые size байтов исходных данных."""
+    return rs.field.to_bytes(messages.reshape(-1, depth, rs.k).transpose(0, 2, 1))[:size]
+
+
+def batch_size(rs, depth):
+    """Байтов данных на один векторный проход: целое число групп, около BATCH_BYTES."""
+    group_bytes = rs.k * depth * rs.field.symbol_size
+    return max(1, BATCH_BYTES // group_bytes) * group_bytes
+
+
+def default_depth(field):
+    """Глубина перемежения: длинное слово GF(2^16) само покрывает пакеты ошибок."""
+    return INTERLEAVE_DEPTH if field.symbol_size == 1 else 1
+
+
+def iter_interleaved(f, rs, depth):
+    """Читает файл пачками групп и раскладывает их по кодовым словам."""
+    while True:
+        data = f.read(batch_size(rs, depth))
+        if not data:
+            return
+        yield deinterleave(data, rs, depth)
+
+
+def interleaved_parity(rs, messages, depth):
+    """Чётность слов, перемежённая так же, как данные: (группа, позиция, слово)."""
+    parity = rs.encode_blocks(messages)
+    return parity.reshape(-1, depth, rs.n - rs.k).transpose(0, 2, 1)
+
+
+def protect_file(file_path, n=255, k=223, depth=None, field=None):
+    """Пишет рядом с файлом файл чётности RS(n, k) с посимвольным перемежением глубины depth.
+
+    По умолчанию поле GF(256); в GF(2^16) (field=GaloisField(65536,
+    GF65536_POLYNOMIAL)) слово может быть длиной до 65535 символов.
+    """
+    field = field or GaloisField(256, GF256_POLYNOMIAL)
+    depth = depth or default_depth(field)
+    rs = ReedSolomon(n, k, field)
+    parity_path = file_path + ".rs"
+    with open(file_path, "rb") as f, open(parity_path, "wb") as out:
+        write_parity_header(out, field, n, k, depth, os.path.getsize(file_path))
+        for messages in iter_interleaved(f, rs, depth):
+            out.write(field.to_bytes(interleaved_parity(rs, messages, depth)))
+    return parity_path
+
+
+def write_parity_header(out, field, n, k, depth, size):
+    out.write(PARITY_MAGIC)
+    out.write(bytes([PARITY_VERSION]))
+    for value in (field.field_size, field.primitive_polynomial, n, k, depth):
+        out.write(value.to_bytes(4, 'big'))
+    out.write(size.to_bytes(8, 'big'))
+
+
+def read_exact(f, size):
+    """Ровно size байтов заголовка; если файл кончился раньше - ValueError."""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Заголовок файла чётности обрывается")
+    return data
+
+
+def read_parity_header(f):
+    """Параметры кода и размер данных; заголовок проверяется до любых выделений памяти."""
+    if f.read(len(PARITY_MAGIC)) != PARITY_MAGIC:
+        raise ValueError("Это не файл чётности Рида-Соломона")
+    version = read_exact(f, 1)[0]
+    if version != PARITY_VERSION:
+        raise ValueError(f"Неподдерживаемая версия файла чётности: {version}")
+    field_size, primitive_polynomial, n, k, depth = (int.from_bytes(read_exact(f, 4), 'big') for _ in range(5))
+    file_size = int.from_bytes(read_exact(f, 8), 'big')
+    field = GaloisField(field_size, primitive_polynomial)
+    if not 0 < k < n < field_size:
+        raise ValueError(f"Недопустимый код в заголовке: RS({n}, {k}) в GF({field_size})")
+    # Глубина больше числа слов в данных не нужна, кроме глубины по умолчанию для малых файлов
+    words = -(-file_size // (field.symbol_size * k))
+    if not 0 < depth <= max(default_depth(field), words):
+        raise ValueError(f"Недопустимая глубина перемежения в заголовке: {depth}")
+    return field, n, k, depth, file_size
+
+
+def check_file(file_path, parity_path=None):
+    """Номера кодовых слов, чья чётность не совпадает с файлом чётности."""
+    parity_path = parity_path or file_path + ".rs"
+    damaged = []
+    with open(parity_path, "rb") as p, open(file_path, "rb") as f:
+        field, n, k, depth, file_size = read_parity_header(p)
+        if os.path.getsize(file_path) != file_size:
+            raise ValueError("Размер файла изменился после создания файла чётности")
+        rs = ReedSolomon(n, k, field)
+        first = 0
+        for messages in iter_interleaved(f, rs, depth):
+            expected = field.to_symbols(p.read(messages.shape[0] * (n - k) * field.symbol_size))
+            actual = interleaved_parity(rs, messages, depth).reshape(-1)
+            if len(expected) != len(actual):
+                raise ValueError("Файл чётности не соответствует размеру данных")
+            mismatch = (expected != actual).reshape(-1, n - k, depth).any(axis=1).reshape(-1)
+            damaged.extend((first + np.flatnonzero(mismatch)).tolist())
+            first += len(messages)
+    return damaged
+
+
+def correct_batch(rs, messages, parity, depth):
+    """Исправляет пачку слов по её чётности (символы в порядке файла чётности).
+
+    Синдромы считаются сразу для всей пачки слов, полный декодер
+    запускается только для слов с ненулевыми синдромами. Возвращает
+    кодовые слова пачки, число повреждённых слов и номера неисправимых.
+    """
+    n, k = rs.n, rs.k
+    parity = parity.reshape(-1, n - k, depth).transpose(0, 2, 1).reshape(-1, n - k)
+    codewords = np.concatenate((messages, parity), axis=1)
+    damaged = np.flatnonzero(rs.compute_syndromes_blocks(codewords).any(axis=1))
+    failed = []
+    for i in damaged:
+        try:
+            codewords[i], _ = rs.decode_codeword(codewords[i])
+        except ValueError:
+            failed.append(int(i))
+    return codewords, len(damaged), failed
+
+
+def repair_file(file_path, parity_path=None):
+    """Исправляет файл (и его файл чётности) на месте.
+
+    Возвращает число исправленных слов и номера слов, которые исправить нельзя.
+    """
+    parity_path = parity_path or file_path + ".rs"
+    repaired = 0
+    failed = []
+    with open(parity_path, "r+b") as p, open(file_path, "r+b") as f:
+        field, n, k, depth, file_size = read_parity_header(p)
+        if os.path.getsize(file_path) != file_size:
+            raise ValueError("Размер файла изменился после создания файла чётности")
+        rs = ReedSolomon(n, k, field)
+        first = 0
+        while True:
+            data_offset, parity_offset = f.tell(), p.tell()
+            data = f.read(batch_size(rs, depth))
+            if not data:
+                break
+            messages = deinterleave(data, rs, depth)
+            parity = field.to_symbols(p.read(len(messages) * (n - k) * field.symbol_size))
+            codewords, damaged, batch_failed = correct_batch(rs, messages, parity, depth)
+            repaired += damaged - len(batch_failed)
+            failed.extend(first + i for i in batch_failed)
+            if damaged:
+                f.seek(data_offset)
+                f.write(interleave(codewords[:, :k], rs, depth, len(data)))
+                p.seek(parity_offset)
+                p.write(field.to_bytes(codewords[:, k:].reshape(-1, depth, n - k).transpose(0, 2, 1)))
+            first += len(messages)
+    return repaired, failed
+
+
+def protect_bytes(data, n=255, k=223, depth=None, field=None):
+    """protect_file в памяти для потоков: заголовок файла чётности, данные и чётность одним блоком."""
+    field = field or GaloisField(256, GF256_POLYNOMIAL)
+    depth = depth or default_depth(field)
+    rs = ReedSolomon(n, k, field)
+    out = io.BytesIO()
+    write_parity_header(out, field, n, k, depth, len(data))
+    out.write(data)
+    view = memoryview(data)
+    step = batch_size(rs, depth)
+    for offset in range(0, len(data), step):
+        out.write(field.to_bytes(interleaved_parity(rs, deinterleave(view[offset:offset + step], rs, depth), depth)))
+    return out.getvalue()
+
+
+def recover_bytes(blob):
+    """Обратное к protect_bytes: данные с исправленными словами, число
+    исправленных слов и номера слов, которые исправить нельзя."""
+    f = io.BytesIO(blob)
+    field, n, k, depth, size = read_parity_header(f)
+    rs = ReedSolomon(n, k, field)
+    start = f.tell()
+    data = memoryview(blob)[start:start + size]
+    if len(data) != size:
+        raise ValueError("Данные обрываются раньше размера из заголовка")
+    f.seek(start + size)
+    out = bytearray()
+    repaired = 0
+    failed = []
+    first = 0
+    step = batch_size(rs, depth)
+    for offset in range(0, size, step):
+        chunk = data[offset:offset + step]
+        messages = deinterleave(chunk, rs, depth)
+        parity = f.read(len(messages) * (n - k) * field.symbol_size)
+        if len(parity) != len(messages) * (n - k) * field.symbol_size:
+            raise ValueError("Чётность не соответствует размеру данных")
+        codewords, damaged, batch_failed = correct_batch(rs, messages, field.to_symbols(parity), depth)
+        repaired += damaged - len(batch_failed)
+        failed.extend(first + i for i in batch_failed)
+        out += interleave(codewords[:, :k], rs, depth, len(chunk)) if damaged else chunk
+        first += len(messages)
+    return bytes(out), repaired, failed
+
+
+def benchmark_decoder(n=255, k=223, error_counts=(0, 1, 4, 8, 16), codewords=200, field=None):
+    """Скорость декодирования (слов в секунду) в зависимости от числа ошибок в слове."""
+    import random
+    import time
+
+    field = field or GaloisField(256, GF256_POLYNOMIAL)
+    rs = ReedSolomon(n, k, field)
+    rng = random.Random(0)
+    messages = np.array([[rng.randrange(field.field_size) for _ in range(k)] for _ in range(codewords)],
+                        dtype=field.dtype)
+    clean = np.concatenate((messages, rs.encode_blocks(messages)), axis=1)
+    rs.decode_codeword(clean[0])  # прогрев
+    results = {}
+    for errors in error_counts:
+        received = clean.copy()
+        for word in received:
+            for position in rng.sample(range(n), errors):
+                word[position] ^= rng.randrange(1, field.field_size)
+        start = time.perf_counter()
+        for word in received:
+            rs.decode_codeword(word)
+        results[errors] = codewords / (time.perf_counter() - start)
+        print(f"Ошибок в слове: {errors}: {results[errors]:.0f} слов/с")
+    return results
+
+
+def benchmark_fields(codes=FIELD_BENCHMARK_CODES, data_size=1 << 20, error_fraction=0.25, seed=0):
+    """Скорость (МБ/с исходных данных) для кодов из codes при одинаковой избыточности.
+
+    Кодирование - чётность всех слов; проверка - синдромы неповреждённых
+    слов; исправление - синдромы и полный декодер для слов, в каждое из
+    которых внесено error_fraction * t ошибок. Данные раскладываются по
+    словам без перемежения.
+    """
+    import time
+
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, 256, data_size, dtype=np.uint8).tobytes()
+    results = []
+    for field_size, n, k in codes:
+        field = GaloisField(field_size, GF256_POLYNOMIAL if field_size == 256 else GF65536_POLYNOMIAL)
+        rs = ReedSolomon(n, k, field)
+        messages = deinterleave(data, rs, 1)
+
+        start = time.perf_counter()
+        codewords = np.concatenate((messages, rs.encode_blocks(messages)), axis=1)
+        encode_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if rs.compute_syndromes_blocks(codewords).any():
+            raise ValueError("Ненулевые синдромы у неповреждённых слов")
+        check_time = time.perf_counter() - start
+
+        errors = max(1, int(rs.t * error_fraction))
+        received = codewords.copy()
+        for word in received:
+            word[rng.choice(n, errors, replace=False)] ^= rng.integers(1, field_size, errors).astype(field.dtype)
+        start = time.perf_counter()
+        for i in np.flatnonzero(rs.compute_syndromes_blocks(received).any(axis=1)):
+            received[i], _ = rs.decode_codeword(received[i])
+        decode_time = time.perf_counter() - start
+        if not np.array_equal(received, codewords):
+            raise ValueError("Декодер не восстановил слова")
+
+        result = {
+            "field_size": field_size, "n": n, "k": k, "codewords": len(messages), "errors_per_word": errors,
+            "encode_mb_s": data_size / encode_time / 1e6,
+            "check_mb_s": data_size / check_time / 1e6,
+            "decode_mb_s": data_size / decode_time / 1e6,
+        }
+        results.append(result)
+        print(f"GF({field_size}) RS({n}, {k}): слов {len(messages)}, ошибок в слове {errors}; "
+              f"кодирование {result['encode_mb_s']:.2f} МБ/с, проверка {result['check_mb_s']:.2f} МБ/с, "
+              f"исправление {result['decode_mb_s']:.2f} МБ/с")
+    return results
 
 
 def main():
 
-    field = GaloisField(256, 0x11d)  # Поле GF(256) с примитивным многочленом 0x11d (x^8 + x^4 + x^3 + x + 1)
+    field = GaloisField(256, GF256_POLYNOMIAL)  # Поле GF(256) с примитивным многочленом 0x11d (x^8 + x^4 + x^3 + x + 1)
     message = input("Введите строку для кодирования: ")
     k = len(message)
     n = 2 * k
@@ -131,4 +679,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import sys
+
+    # python lab2.py --benchmark - сравнение GF(256) и GF(2^16) при одинаковой избыточности
+    if sys.argv[1:] == ["--benchmark"]:
+        benchmark_fields()
+    else:
+        main()
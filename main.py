@@ -1,90 +1,67 @@
+import sys
+from collections import Counter
 
-# Узел дерева Хаффмана
-class Node:
-    def __init__(self, char, freq):
-        self.char = char
-        self.freq = freq
-        self.left = None
-        self.right = None
+import numpy as np
 
-    def __lt__(self, other):
-        return self.freq < other.freq
+import instrument
+from haffman import (canonical_code_values, decompress_data, huffman_code_lengths,
+                     limit_code_lengths)
 
 
-# Построение дерева Хаффмана
-def build_huffman_tree(text):
-    frequency = Counter(text)
-    print(frequency)
-    heap = [Node(char, freq) for char, freq in frequency.items()]
-    heapq.heapify(heap)
+# Ограничение длины кода: хватает для алфавита из всего Unicode, а длинные
+# коды табличный декодер haffman держит во вторичных таблицах
+MAX_CODE_LENGTH = 32
 
-    while len(heap) > 1:
-        left = heapq.heappop(heap)
-        right = heapq.heappop(heap)
-        merged = Node(None, left.freq + right.freq)
-        merged.left = left
-        merged.right = right
-        heapq.heappush(heap, merged)
 
-    return heap[0]
+# Частоты символов текста
+@instrument.stage("count_frequency", measure_output=False)
+def count_frequency(text):
+    return Counter(text)
 
 
-# Создание кодов для каждого символа
-def build_codes(node, prefix="", codebook={}):
-    if node is None:
-        return
-    if node.char is not None:
-        codebook[node.char] = prefix
-    build_codes(node.left, prefix + "0", codebook)
-    build_codes(node.right, prefix + "1", codebook)
-    return codebook
+# Канонические коды символов по длинам кодов Хаффмана из haffman
+@instrument.stage("build_codes", data_arg=None, measure_output=False)
+def build_codes(frequency, max_code_length=MAX_CODE_LENGTH):
+    chars = list(frequency)
+    counts = np.fromiter(frequency.values(), dtype=np.int64, count=len(chars))
+    lengths = limit_code_lengths(counts, huffman_code_lengths(counts), max_code_length)
+    codes = canonical_code_values(lengths)
+    # Единственный символ текста получает код из одного бита
+    return {char: format(code, f'0{length}b')
+            for char, code, length in zip(chars, codes.tolist(), lengths.tolist())}
 
 
 # Кодирование текста
+@instrument.stage("huffman_encode")
 def huffman_encode(text, codebook):
     return ''.join(codebook[char] for char in text)
 
 
-# Декодирование текста
-def huffman_decode(encoded_text, tree):
-    decoded_text = []
-    node = tree
-    for bit in encoded_text:
-        if bit == '0':
-            node = node.left
-        else:
-            node = node.right
-        if node.left is None and node.right is None:
-            decoded_text.append(node.char)
-            node = tree
-    return ''.join(decoded_text)
+# Декодирование текста: табличный декодер из haffman по кодам символов
+@instrument.stage("huffman_decode")
+def huffman_decode(encoded_text, codebook):
+    code_table = {code: ord(char) for char, code in codebook.items()}
+    # Строка '0'/'1' -> биты, упакованные старшим первым; хвост дополняется нулями
+    bits = np.frombuffer(encoded_text.encode('ascii'), dtype=np.uint8) - ord('0')
+    packed = np.packbits(bits).tobytes()
+    decoded = decompress_data(packed, len(encoded_text), code_table, 'I')
+    return decoded.tobytes().decode('utf-32-le' if sys.byteorder == 'little' else 'utf-32-be')
 
 
-def print_huffman_tree(node, prefix=""):
-    if node is None:
-        return
-
-    # Если узел является листом (имеет символ)
-    if node.char is not None:
-        print(f"{prefix}└─({node.char}:{node.freq})")
-    else:
-        # Узел не является листом, печатаем частоту
-        print(f"{prefix}├─({node.freq})")
-
-    # Рекурсивно печатаем левое и правое поддерево с отступом
-    if node.left is not None:
-        print_huffman_tree(node.left, prefix + "   ")
-    if node.right is not None:
-        print_huffman_tree(node.right, prefix + "   ")
+@instrument.stage("write_text", data_arg=1, measure_output=False)
+def write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as w:
+        w.write(text)
 
 
 # Функция для оценки эффективности
-def evaluate_compression(original_text, encod_text, time_foo = None, cbook=None, treePr=None):
-    if treePr:
-        print_huffman_tree(treePr)
+def evaluate_compression(original_text, encod_text, time_foo = None, cbook=None, frequency=None):
+    if frequency:
+        print(frequency)
     if cbook:
         print(cbook)
-    original_size = len(original_text) * 8
+    # Настоящий размер исходного текста в UTF-8, а не 8 бит на символ
+    original_size = len(original_text.encode('utf-8')) * 8
 
     compressed_size = len(encod_text)
 
@@ -103,28 +80,27 @@ def main():
         with open('text.txt', 'r', encoding='utf-8') as f:
             text = f.read()
 
-        tree = build_huffman_tree(text)
-        codebook = build_codes(tree)
+        frequency = count_frequency(text)
+        codebook = build_codes(frequency)
 
         encoded_text = huffman_encode(text, codebook)
 
-        with open('encoded_text.txt', 'w', encoding='utf-8') as w:
-            w.write(encoded_text)
+        write_text('encoded_text.txt', encoded_text)
 
-        decoded_text = huffman_decode(encoded_text, tree)
-        with open('decoded_text.txt', 'w', encoding='utf-8') as w:
-            w.write(decoded_text)
-        return text, encoded_text, codebook, tree
+        decoded_text = huffman_decode(encoded_text, codebook)
+        write_text('decoded_text.txt', decoded_text)
+        return text, encoded_text, codebook, frequency
 
     except Exception as e:
         print(e)
 
 
 if __name__ == '__main__':
-    import heapq
-    from collections import Counter
     import time
-    start_t = time.time()
-    text, encoded_text, codebook, tree = main()
-    end_time = time.time() - start_t
-    evaluate_compression(text, encoded_text, end_time, codebook, tree)
+    # Время по стадиям; INSTRUMENT_MODE=memory,profile и INSTRUMENT_OUTPUT=путь.json - подробнее
+    with instrument.collect_from_env() as collector:
+        start_t = time.perf_counter()
+        text, encoded_text, codebook, frequency = main()
+        end_time = time.perf_counter() - start_t
+    evaluate_compression(text, encoded_text, end_time, codebook, frequency)
+    instrument.print_stats(collector)
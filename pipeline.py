@@ -0,0 +1,246 @@
+import io
+import os
+from functools import partial
+
+import numpy as np
+
+import haffman
+import rle
+
+# Конвейер преобразований BWT -> MTF -> RLE -> Хаффман.
+# Каждая стадия - пара функций (кодирование, декодирование) над одним блоком
+# байтов; блоки проходят стадии через цепочку генераторов и кодируются
+# независимо друг от друга, поэтому конвейер потоковый и параллелится по блокам.
+
+# Размер блока: BWT сортирует все циклические сдвиги блока сразу
+BLOCK_SIZE = 1 << 19
+DEFAULT_STAGES = ("bwt", "mtf", "rle", "huffman")
+
+
+def rotation_order(data):
+    """Порядок циклических сдвигов блока: суффиксный массив префиксным удвоением.
+
+    Ранги сначала строятся по первым четырём байтам сдвига, затем на каждом
+    шаге пара (ранг, ранг сдвига через k) сжимается в новый плотный ранг.
+    Полностью совпадающие сдвиги (периодичный блок) остаются равными - для
+    обратного преобразования их порядок не важен.
+    """
+    n = len(data)
+    positions = np.arange(n)
+    symbols = data.astype(np.int64)
+    key = np.zeros(n, dtype=np.int64)
+    for shift in range(4):
+        key = (key << 8) | symbols[(positions + shift) % n]
+    k = 4
+    while True:
+        order = np.argsort(key)
+        sorted_key = key[order]
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.concatenate(([0], np.cumsum(sorted_key[1:] != sorted_key[:-1])))
+        if rank[order[-1]] == n - 1 or k >= n:
+            return order
+        key = (rank << 32) | rank[(positions + k) % n]
+        k *= 2
+
+
+def bwt_encode(block):
+    """Преобразование Барроуза-Уилера: номер исходной строки (4 байта) и последний столбец."""
+    data = np.frombuffer(block, dtype=np.uint8)
+    order = rotation_order(data)
+    primary = int(np.flatnonzero(order == 0)[0])
+    last = data[(order - 1) % len(data)]
+    return primary.to_bytes(4, 'big') + last.tobytes()
+
+
+def bwt_decode(block):
+    primary = int.from_bytes(block[:4], 'big')
+    last = np.frombuffer(block, dtype=np.uint8, offset=4)
+    n = len(last)
+    if primary >= n:
+        raise ValueError("Повреждённый блок BWT: номер строки вне блока")
+    # next_row[i] - строка, начинающаяся на следующей позиции текста после строки i.
+    # Обход цепочки последователен; на списках он быстрее удвоения указателей в NumPy
+    next_row = np.argsort(last, kind='stable').tolist()
+    symbols = last.tolist()
+    out = bytearray(n)
+    row = next_row[primary]
+    for i in range(n):
+        out[i] = symbols[row]
+        row = next_row[row]
+    return bytes(out)
+
+
+def mtf_encode(block):
+    """Move-to-front. Внутри серии одинаковых байтов выход всегда 0, поэтому
+    список переставляется только на первых байтах серий."""
+    data = np.frombuffer(block, dtype=np.uint8)
+    out = np.zeros(len(data), dtype=np.uint8)
+    if not len(data):
+        return b''
+    heads = np.flatnonzero(np.concatenate(([True], data[1:] != data[:-1])))
+    table = list(range(256))
+    values = []
+    for symbol in data[heads].tolist():
+        index = table.index(symbol)
+        values.append(index)
+        if index:
+            del table[index]
+            table.insert(0, symbol)
+    out[heads] = values
+    return out.tobytes()
+
+
+def mtf_decode(block):
+    values = np.frombuffer(block, dtype=np.uint8)
+    if not len(values):
+        return b''
+    # Ненулевое значение (и самый первый байт) начинает новую серию
+    heads = np.flatnonzero(values)
+    if not len(heads) or heads[0]:
+        heads = np.concatenate(([0], heads))
+    table = list(range(256))
+    symbols = []
+    for index in values[heads].tolist():
+        symbol = table[index]
+        if index:
+            del table[index]
+            table.insert(0, symbol)
+        symbols.append(symbol)
+    run = np.zeros(len(values), dtype=np.intp)
+    run[heads] = np.arange(len(heads))
+    return np.array(symbols, dtype=np.uint8)[np.maximum.accumulate(run)].tobytes()
+
+
+def huffman_encode(block):
+    """Канонический код Хаффмана блока: длины кодов, длина потока в битах и поток."""
+    code_lengths = haffman.build_code_lengths(haffman.build_frequency_table(block))
+    compressed, bit_length = haffman.compress_data(block, haffman.build_canonical_codes(code_lengths))
+    f = io.BytesIO()
+    haffman.write_code_lengths(f, code_lengths)
+    f.write(bit_length.to_bytes(4, 'big'))
+    f.write(compressed)
+    return f.getvalue()
+
+
+def huffman_decode(block):
+    f = io.BytesIO(block)
+    code_table = haffman.build_canonical_codes(haffman.read_code_lengths(f))
+    bit_length = int.from_bytes(f.read(4), 'big')
+    decoded = haffman.decompress_data(f.read(), bit_length, {code: symbol for symbol, code in code_table.items()})
+    return bytes(decoded)
+
+
+# Стадии по имени; номер стадии в заголовке контейнера - её позиция в этом словаре
+STAGES = {
+    "bwt": (bwt_encode, bwt_decode),
+    "mtf": (mtf_encode, mtf_decode),
+    "rle": (rle.rle_compress_bytes, rle.rle_decompress_bytes),
+    "huffman": (huffman_encode, huffman_decode),
+}
+STAGE_IDS = {name: i for i, name in enumerate(STAGES)}
+
+
+def apply_stage(blocks, function):
+    for block in blocks:
+        yield function(block)
+
+
+def encode_blocks(blocks, stages=DEFAULT_STAGES):
+    """Цепочка генераторов: каждый блок проходит стадии по порядку."""
+    for name in stages:
+        blocks = apply_stage(blocks, STAGES[name][0])
+    return blocks
+
+
+def decode_blocks(blocks, stages=DEFAULT_STAGES):
+    for name in reversed(stages):
+        blocks = apply_stage(blocks, STAGES[name][1])
+    return blocks
+
+
+def encode_block(block, stages=DEFAULT_STAGES):
+    """Все стадии для одного блока: единица работы для пула процессов."""
+    return next(encode_blocks([block], stages))
+
+
+def decode_block(block, stages=DEFAULT_STAGES):
+    return next(decode_blocks([block], stages))
+
+
+def write_stages(f, stages):
+    for name in stages:
+        if name not in STAGES:
+            raise ValueError(f"Неизвестная стадия конвейера: {name}")
+    f.write(bytes([len(stages)]))
+    f.write(bytes(STAGE_IDS[name] for name in stages))
+
+
+def read_stages(f):
+    names = list(STAGES)
+    ids = haffman.read_exact(f, haffman.read_exact(f, 1)[0])
+    if any(i >= len(names) for i in ids):
+        raise ValueError("Неизвестная стадия конвейера в заголовке")
+    return tuple(names[i] for i in ids)
+
+
+def write_container_blocks(out, encoded_blocks):
+    """Блоки контейнера: размер (4 байта) и закодированный блок; в конце - нулевой размер."""
+    for encoded in encoded_blocks:
+        out.write(len(encoded).to_bytes(4, 'big'))
+        out.write(encoded)
+    out.write(bytes(4))
+
+
+def iter_container_blocks(f):
+    while True:
+        size = f.read(4)
+        if len(size) < 4:
+            raise ValueError("Контейнер конвейера обрывается без завершающего блока")
+        size = int.from_bytes(size, 'big')
+        if not size:
+            return
+        yield f.read(size)
+
+
+def iter_encoded(blocks, stages=DEFAULT_STAGES, workers=1):
+    """Кодирует блоки последовательно цепочкой генераторов или параллельно по блокам."""
+    if workers == 1:
+        return encode_blocks(blocks, stages)
+    return haffman.parallel_map(partial(encode_block, stages=stages), blocks, workers)
+
+
+def iter_decoded(blocks, stages=DEFAULT_STAGES, workers=1):
+    if workers == 1:
+        return decode_blocks(blocks, stages)
+    return haffman.parallel_map(partial(decode_block, stages=stages), blocks, workers)
+
+
+def compress_file(file_path, stages=DEFAULT_STAGES, block_size=BLOCK_SIZE, workers=1):
+    """Сжимает файл конвейером в контейнер haffman (версия формата PIPELINE_FORMAT_VERSION)."""
+    file_extension = os.path.splitext(file_path)[1][1:]
+    compressed_file_path = os.path.splitext(file_path)[0] + ".bin"
+    with open(file_path, "rb") as f, open(compressed_file_path, "wb") as out:
+        out.write(haffman.MAGIC)
+        out.write(bytes([haffman.PIPELINE_FORMAT_VERSION]))
+        out.write(len(file_extension).to_bytes(1, 'big'))
+        out.write(file_extension.encode())
+        write_stages(out, stages)
+        write_container_blocks(out, iter_encoded(haffman.iter_chunks(f, block_size), stages, workers))
+    print(f"Файл сжат и сохранен как {compressed_file_path}")
+    return compressed_file_path
+
+
+def compress(data, stages=DEFAULT_STAGES, block_size=BLOCK_SIZE):
+    """Сжатие в памяти: список стадий и блоки, как в файловом контейнере без его заголовка."""
+    f = io.BytesIO()
+    write_stages(f, stages)
+    view = memoryview(data)
+    write_container_blocks(f, encode_blocks((view[i:i + block_size] for i in range(0, len(data), block_size)),
+                                            stages))
+    return f.getvalue()
+
+
+def decompress(compressed):
+    f = io.BytesIO(compressed)
+    stages = read_stages(f)
+    return b''.join(decode_blocks(iter_container_blocks(f), stages))
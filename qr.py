@@ -1,7 +1,16 @@
 import qrcode
-from PIL import Image, ImageDraw
-import random
+from PIL import Image, ImageDraw, ImageFilter
+import numpy as np
+import json
 import os
+import sys
+from functools import partial
+
+# Зерно генератора случайных чисел: одинаковые повреждения при каждом запуске
+SEED = 12345
+# Уровень сжатия PNG (0 - без сжатия, 9 - максимальное); 6 - значение Pillow по умолчанию
+PNG_COMPRESS_LEVEL = 6
+MANIFEST_NAME = "manifest.jsonl"
 
 
 def generate_qr(text, fill_color="black", back_color="white"):
@@ -35,35 +44,152 @@ def add_black_square(image, position, scale=0.3):
     return image
 
 
-def add_pixel_noise(image, level):
-    """Добавляет сильный шум в QR-код (меняет пиксели)."""
-    pixels = image.load()
-    width, height = image.size
-    for _ in range(level):
-        x, y = random.randint(0, width - 1), random.randint(0, height - 1)
-        current_color = pixels[x, y]
-        if current_color == (0, 0, 0):  # Черный пиксель
-            pixels[x, y] = (255, 255, 255)  # Белый
-        elif current_color == (255, 255, 255):  # Белый пиксель
-            pixels[x, y] = (0, 0, 0)  # Черный
+def add_pixel_noise(image, level, rng=None):
+    """Добавляет сильный шум в QR-код (меняет пиксели).
+
+    Выбирается level случайных пикселей (с повторами, как раньше):
+    пиксель, выбранный нечётное число раз, меняет чёрный на белый и наоборот.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    pixels = np.array(image)
+    height, width = pixels.shape[:2]
+    hits = np.bincount(rng.integers(0, width * height, size=level), minlength=width * height)
+    flip = (hits % 2 == 1).reshape(height, width)
+    black = (pixels == 0).all(axis=2)
+    white = (pixels == 255).all(axis=2)
+    pixels[flip & black] = 255
+    pixels[flip & white] = 0
+    image.paste(Image.fromarray(pixels))
+    return image
+
+
+def add_block_erasures(image, count, scale=0.1, rng=None, fill=(255, 255, 255)):
+    """Стирает count случайных квадратов со стороной scale от размера изображения."""
+    rng = rng if rng is not None else np.random.default_rng()
+    pixels = np.array(image)
+    height, width = pixels.shape[:2]
+    size = max(1, int(min(width, height) * scale))
+    xs = rng.integers(0, width - size + 1, size=count)
+    ys = rng.integers(0, height - size + 1, size=count)
+    for x, y in zip(xs, ys):
+        pixels[y:y + size, x:x + size] = fill
+    image.paste(Image.fromarray(pixels))
     return image
 
 
+def add_gaussian_blur(image, radius):
+    """Размывает изображение фильтром Гаусса."""
+    return image.filter(ImageFilter.GaussianBlur(radius))
+
+
+def rotate_image(image, angle):
+    """Поворачивает QR-код, заполняя открывшиеся углы белым."""
+    return image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=(255, 255, 255))
+
+
+def recolor(image, color):
+    """Перекрашивает черные пиксели QR-кода в цвет color."""
+    black = (np.asarray(image) == 0).all(axis=2)  # Черные пиксели
+    pixels = np.full(black.shape + (3,), 255, dtype=np.uint8)
+    pixels[black] = color
+    return Image.fromarray(pixels)
+
+
 def generate_color_variants(image):
     """Создает цветные варианты QR-кода."""
-    width, height = image.size
-    pixels = image.load()
-    variants = []
     colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]  # Красный, зеленый, синий
-    for color in colors:
-        img = Image.new("RGB", (width, height), "white")
-        img_pixels = img.load()
-        for x in range(width):
-            for y in range(height):
-                if pixels[x, y] == (0, 0, 0):  # Черный пиксель
-                    img_pixels[x, y] = color
-        variants.append(img)
-    return variants
+    return [recolor(image, color) for color in colors]
+
+
+# Виды повреждений для пакетного режима: имя -> функция (изображение, параметр, rng).
+# Функции получают копию базового QR-кода и могут менять её на месте.
+DAMAGE_MODES = {
+    "none": lambda image, param, rng: image,
+    "square": lambda image, param, rng: add_black_square(image, param, scale=0.4),
+    "noise": lambda image, param, rng: add_pixel_noise(image, param, rng),
+    "erasure": lambda image, param, rng: add_block_erasures(image, param, scale=0.1, rng=rng),
+    "blur": lambda image, param, rng: add_gaussian_blur(image, param),
+    "rotate": lambda image, param, rng: rotate_image(image, param),
+    "color": lambda image, param, rng: recolor(image, tuple(param)),
+}
+
+# Матрица повреждений по умолчанию - тот же набор, что и в интерактивном режиме
+DEFAULT_DAMAGE_MATRIX = (
+    [("square", position) for position in ["center", "top-left", "top-right", "bottom-left", "bottom-right"]]
+    + [("noise", level) for level in [2000, 5000, 50000]]
+    + [("erasure", count) for count in [3, 6]]
+    + [("blur", radius) for radius in [1, 2]]
+    + [("rotate", angle) for angle in [15, 45]]
+    + [("color", color) for color in [(255, 0, 0), (0, 255, 0), (0, 0, 255)]]
+)
+
+
+def render_payload(index, payload, damage_matrix, output_dir, compress_level=PNG_COMPRESS_LEVEL, seed=SEED):
+    """Строит все варианты одного QR-кода и сохраняет их в PNG.
+
+    Выполняется в рабочем процессе: и отрисовка, и сжатие PNG происходят здесь,
+    в главный процесс возвращаются только строки манифеста. Генератор случайных
+    чисел зависит от seed и номера строки, поэтому результат не зависит от того,
+    какой процесс и в каком порядке обработал задачу.
+    """
+    rng = np.random.default_rng([seed, index])
+    base = generate_qr(payload)
+    entries = []
+    for variant, (mode, param) in enumerate(damage_matrix):
+        if mode not in DAMAGE_MODES:
+            raise ValueError(f"Неизвестный вид повреждения: {mode}")
+        image = DAMAGE_MODES[mode](base.copy(), param, rng)
+        file_name = f"qr_{index:06d}_{variant:02d}_{mode}.png"
+        path = os.path.join(output_dir, file_name)
+        image.save(path, compress_level=compress_level)
+        entries.append({
+            "file": file_name,
+            "payload_index": index,
+            "payload": payload,
+            "damage": mode,
+            "param": param,
+            "width": image.size[0],
+            "height": image.size[1],
+            "bytes": os.path.getsize(path),
+        })
+    return entries
+
+
+def _render_payload_item(item, damage_matrix, output_dir, compress_level, seed):
+    index, payload = item
+    return render_payload(index, payload, damage_matrix, output_dir, compress_level, seed)
+
+
+def generate_dataset(payloads, output_dir, damage_matrix=DEFAULT_DAMAGE_MATRIX, workers=None,
+                     compress_level=PNG_COMPRESS_LEVEL, seed=SEED):
+    """Пакетно генерирует набор повреждённых QR-кодов.
+
+    Каждая строка payloads отрисовывается со всеми повреждениями из damage_matrix
+    (список пар (вид, параметр)) в пуле процессов. Манифест manifest.jsonl
+    (по строке JSON на вариант) дописывается по мере готовности результатов
+    в порядке payloads, так что память главного процесса не растёт с размером набора.
+    Возвращает число сохранённых изображений.
+    """
+    for mode, _ in damage_matrix:
+        if mode not in DAMAGE_MODES:
+            raise ValueError(f"Неизвестный вид повреждения: {mode}")
+    if not 0 <= compress_level <= 9:
+        raise ValueError("Уровень сжатия PNG должен быть от 0 до 9")
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    task = partial(_render_payload_item, damage_matrix=list(damage_matrix), output_dir=output_dir,
+                   compress_level=compress_level, seed=seed)
+    # Пул процессов нужен только пакетному режиму: его импорт не удлиняет запуск ради одного кода
+    from concurrent.futures import ProcessPoolExecutor
+
+    count = 0
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w", encoding="utf-8") as manifest:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for entries in pool.map(task, enumerate(payloads), chunksize=4):
+                for entry in entries:
+                    manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                count += len(entries)
+    return count
 
 
 def save_images(images, output_dir, base_name):
@@ -89,11 +215,21 @@ def main():
         img = qr_base.copy()
         images.append(add_black_square(img, position, scale=0.4))  # Увеличен размер квадратов
 
+    rng = np.random.default_rng(SEED)
+
     # QR-коды с сильным шумом
     noise_levels = [2000, 5000, 50000]  # Усиленный шум
     for level in noise_levels:
         img = qr_base.copy()
-        images.append(add_pixel_noise(img, level))
+        images.append(add_pixel_noise(img, level, rng))
+
+    # Стёртые блоки, размытие и поворот
+    for count in [3, 6]:
+        images.append(add_block_erasures(qr_base.copy(), count, scale=0.1, rng=rng))
+    for radius in [1, 2]:
+        images.append(add_gaussian_blur(qr_base, radius))
+    for angle in [15, 45]:
+        images.append(rotate_image(qr_base, angle))
 
     # Цветные QR-коды
     images.extend(generate_color_variants(qr_base))
@@ -103,5 +239,16 @@ def main():
     print(f"QR-коды сохранены в папке {output_dir}")
 
 
+def batch_main(payloads_path, output_dir, workers=None):
+    """Пакетный режим: одна строка файла payloads_path - один QR-код."""
+    with open(payloads_path, "r", encoding="utf-8") as f:
+        payloads = [line.rstrip("\n") for line in f if line.strip()]
+    count = generate_dataset(payloads, output_dir, workers=workers)
+    print(f"Сохранено {count} изображений, манифест: {os.path.join(output_dir, MANIFEST_NAME)}")
+
+
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 2:
+        batch_main(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    else:
+        main()
@@ -0,0 +1,276 @@
+import io
+from collections import namedtuple
+
+import numpy as np
+
+# Табличный rANS с чередованием состояний.
+# Данные блока раскладываются по дорожкам (символ i - дорожке i % lanes),
+# у каждой дорожки своё 32-битное состояние; шаг кодирования и декодирования
+# обрабатывает сразу по символу всех дорожек векторно. Число дорожек растёт
+# с размером блока до LANES; малые блоки кодируются на целых Python.
+
+# Частоты квантуются к сумме 1 << PROB_BITS
+PROB_BITS = 12
+PROB_SCALE = 1 << PROB_BITS
+# Нижняя граница состояния; нормализация выдаёт и читает 16-битные слова
+RANS_L = 1 << 16
+WORD_BITS = 16
+# Наибольшее число чередующихся состояний (дорожек) в блоке
+LANES = 1024
+# Каждая дорожка хранит 4 байта конечного состояния: дорожек в блоке не больше
+# чем по одной на столько символов, так что эта добавка не выше ~1% блока
+MIN_SYMBOLS_PER_LANE = 512
+# При меньшем числе дорожек блок кодируется на целых Python: шаг NumPy стоит
+# десятки микросекунд и окупается, только когда обрабатывает много дорожек
+VECTOR_MIN_LANES = 64
+# Размер независимо кодируемого блока
+BLOCK_SIZE = 1 << 22
+# Заголовок блока: исходный размер, число дорожек, число 16-битных слов
+BLOCK_HEADER_SIZE = 10
+
+# Таблицы кодирования и декодирования для набора квантованных частот
+RansTables = namedtuple("RansTables", ["freqs", "cum", "slot_symbols"])
+
+
+def quantize_frequencies(frequency_table, prob_bits=PROB_BITS):
+    """Приводит частоты (как из build_frequency_table) к сумме 1 << prob_bits.
+
+    Каждый встретившийся символ получает частоту не меньше 1; расхождение
+    суммы после округления снимается с самых частых символов.
+    """
+    scale = 1 << prob_bits
+    counts = np.zeros(256, dtype=np.int64)
+    for symbol, frequency in frequency_table.items():
+        counts[symbol] = frequency
+    present = np.flatnonzero(counts)
+    if len(present) > scale:
+        raise ValueError("Символов больше, чем позволяет точность частот")
+    freqs = np.zeros(256, dtype=np.int64)
+    if not len(present):
+        return freqs.astype(np.uint32)
+    freqs[present] = np.maximum(1, counts[present] * scale // counts.sum())
+    order = present[np.argsort(-counts[present], kind='stable')]
+    difference = scale - int(freqs.sum())
+    i = 0
+    while difference:
+        symbol = order[i % len(order)]
+        if difference > 0:
+            freqs[symbol] += 1
+            difference -= 1
+        elif freqs[symbol] > 1:
+            freqs[symbol] -= 1
+            difference += 1
+        i += 1
+    return freqs.astype(np.uint32)
+
+
+def build_tables(freqs):
+    """Накопленные частоты и таблица слот -> символ для декодера."""
+    freqs = np.asarray(freqs, dtype=np.uint32)
+    cum = np.zeros(257, dtype=np.uint32)
+    np.cumsum(freqs, out=cum[1:])
+    slot_symbols = np.repeat(np.arange(256, dtype=np.uint8), freqs)
+    return RansTables(freqs.astype(np.uint64), cum[:256].astype(np.uint64), slot_symbols)
+
+
+def write_frequencies(f, freqs):
+    """Частоты символов: число ненулевых (2 байта), затем пары (символ, частота)."""
+    present = np.flatnonzero(freqs)
+    f.write(len(present).to_bytes(2, 'big'))
+    for symbol in present.tolist():
+        f.write(bytes([symbol]))
+        f.write(int(freqs[symbol]).to_bytes(2, 'big'))
+
+
+def read_frequencies(f):
+    freqs = np.zeros(256, dtype=np.uint32)
+    count = f.read(2)
+    if len(count) != 2:
+        raise ValueError("Таблица частот rANS обрывается")
+    for _ in range(int.from_bytes(count, 'big')):
+        entry = f.read(3)
+        if len(entry) != 3:
+            raise ValueError("Таблица частот rANS обрывается")
+        freqs[entry[0]] = int.from_bytes(entry[1:], 'big')
+    if freqs.any() and int(freqs.sum()) != PROB_SCALE:
+        raise ValueError("Повреждённая таблица частот rANS")
+    return freqs
+
+
+def encode_block(block, tables, lanes=LANES):
+    """Кодирует блок байтов: заголовок блока, конечные состояния дорожек, слова потока."""
+    data = np.frombuffer(block, dtype=np.uint8)
+    n = len(data)
+    lanes = max(1, min(lanes, n // MIN_SYMBOLS_PER_LANE))
+    steps = -(-n // lanes)
+    freqs, cum = tables.freqs, tables.cum
+    if (freqs == 0)[data].any():
+        raise ValueError("В блоке есть символ с нулевой частотой")
+    if lanes < VECTOR_MIN_LANES:
+        state, words = encode_scalar(data, lanes, tables)
+        state = np.array(state, dtype=np.uint64)
+        words = np.array(words, dtype='>u2')
+        return b''.join([n.to_bytes(4, 'big'), lanes.to_bytes(2, 'big'), len(words).to_bytes(4, 'big'),
+                         state.astype('>u4').tobytes(), words.tobytes()])
+    state = np.full(lanes, RANS_L, dtype=np.uint64)
+    # Верхняя граница состояния перед кодированием символа с частотой f
+    x_max_base = np.uint64((RANS_L >> PROB_BITS) << WORD_BITS)
+    word_mask = np.uint64((1 << WORD_BITS) - 1)
+    prob_bits = np.uint64(PROB_BITS)
+    word_bits = np.uint64(WORD_BITS)
+    emitted = []
+    # Кодирование идёт с конца: декодер получит символы в прямом порядке
+    for t in range(steps - 1, -1, -1):
+        symbols = data[t * lanes:(t + 1) * lanes]
+        count = len(symbols)
+        x = state[:count]
+        f = freqs[symbols]
+        renorm = x >= x_max_base * f
+        if renorm.any():
+            emitted.append((x[renorm] & word_mask).astype(np.uint16))
+            x[renorm] >>= word_bits
+        x[:] = ((x // f) << prob_bits) + x % f + cum[symbols]
+    words = np.concatenate(emitted[::-1]).astype('>u2') if emitted else np.empty(0, dtype='>u2')
+    return b''.join([
+        n.to_bytes(4, 'big'),
+        lanes.to_bytes(2, 'big'),
+        len(words).to_bytes(4, 'big'),
+        state.astype('>u4').tobytes(),
+        words.tobytes(),
+    ])
+
+
+def encode_scalar(data, lanes, tables):
+    """Дорожки на целых Python: при малом числе дорожек векторный шаг дороже самих символов.
+
+    Символ i идёт в дорожку i % lanes, как в векторном кодере; возвращает
+    конечные состояния и слова потока в порядке чтения декодером.
+    """
+    freqs, cum = tables.freqs.tolist(), tables.cum.tolist()
+    x_max_base = (RANS_L >> PROB_BITS) << WORD_BITS
+    word_mask = (1 << WORD_BITS) - 1
+    state = [RANS_L] * lanes
+    words = []
+    for i, symbol in zip(range(len(data) - 1, -1, -1), reversed(data.tolist())):
+        lane = i % lanes
+        x = state[lane]
+        f = freqs[symbol]
+        if x >= x_max_base * f:
+            words.append(x & word_mask)
+            x >>= WORD_BITS
+        state[lane] = ((x // f) << PROB_BITS) + x % f + cum[symbol]
+    words.reverse()
+    return state, words
+
+
+def decode_scalar(state, words, n, tables):
+    """Обратное к encode_scalar; состояния в state возвращаются к начальным."""
+    freqs, cum, slot_symbols = tables.freqs.tolist(), tables.cum.tolist(), tables.slot_symbols.tolist()
+    slot_mask = PROB_SCALE - 1
+    lanes = len(state)
+    out = bytearray(n)
+    pos = 0
+    for i in range(n):
+        lane = i % lanes
+        x = state[lane]
+        slot = x & slot_mask
+        symbol = slot_symbols[slot]
+        out[i] = symbol
+        x = freqs[symbol] * (x >> PROB_BITS) + slot - cum[symbol]
+        if x < RANS_L:
+            if pos >= len(words):
+                raise ValueError("Поток rANS обрывается")
+            x = (x << WORD_BITS) | words[pos]
+            pos += 1
+        state[lane] = x
+    if pos != len(words):
+        raise ValueError("Повреждённый блок rANS: лишние слова в потоке")
+    return bytes(out)
+
+
+def decode_block(block_header, body, tables):
+    """Декодирует блок: на каждом шаге по символу каждой дорожки, слова дочитываются векторно."""
+    n = int.from_bytes(block_header[:4], 'big')
+    lanes = int.from_bytes(block_header[4:6], 'big')
+    word_count = int.from_bytes(block_header[6:10], 'big')
+    if len(body) != 4 * lanes + 2 * word_count or not lanes:
+        raise ValueError("Повреждённый блок rANS")
+    state = np.frombuffer(body, dtype='>u4', count=lanes).astype(np.uint64)
+    words = np.frombuffer(body, dtype='>u2', offset=4 * lanes).astype(np.uint64)
+    freqs, cum, slot_symbols = tables.freqs, tables.cum, tables.slot_symbols
+    if not len(slot_symbols):
+        raise ValueError("Пустая таблица частот rANS")
+    if lanes < VECTOR_MIN_LANES:
+        state = state.astype(np.int64).tolist()
+        out = decode_scalar(state, words.tolist(), n, tables)
+        if any(x != RANS_L for x in state):
+            raise ValueError("Повреждённый блок rANS: состояние не вернулось к начальному")
+        return out
+    slot_mask = np.uint64(PROB_SCALE - 1)
+    prob_bits = np.uint64(PROB_BITS)
+    word_bits = np.uint64(WORD_BITS)
+    out = np.empty(n, dtype=np.uint8)
+    pos = 0
+    for start in range(0, n, lanes):
+        count = min(lanes, n - start)
+        x = state[:count]
+        slot = x & slot_mask
+        symbols = slot_symbols[slot]
+        out[start:start + count] = symbols
+        x[:] = freqs[symbols] * (x >> prob_bits) + slot - cum[symbols]
+        renorm = x < RANS_L
+        need = int(np.count_nonzero(renorm))
+        if need:
+            if pos + need > len(words):
+                raise ValueError("Поток rANS обрывается")
+            x[renorm] = (x[renorm] << word_bits) | words[pos:pos + need]
+            pos += need
+    if pos != len(words) or (state != RANS_L).any():
+        raise ValueError("Повреждённый блок rANS: состояние не вернулось к начальному")
+    return out.tobytes()
+
+
+def iter_blocks(f):
+    """Блоки потока (заголовок, тело) до завершающего блока нулевого размера."""
+    while True:
+        block_header = f.read(4)
+        if len(block_header) < 4:
+            raise ValueError("Поток rANS обрывается без завершающего блока")
+        if not int.from_bytes(block_header, 'big'):
+            return
+        block_header += f.read(BLOCK_HEADER_SIZE - 4)
+        lanes = int.from_bytes(block_header[4:6], 'big')
+        word_count = int.from_bytes(block_header[6:10], 'big')
+        yield block_header, f.read(4 * lanes + 2 * word_count)
+
+
+def write_blocks(out, chunks, tables):
+    """Кодирует последовательность блоков байтов и дописывает завершающий блок."""
+    for chunk in chunks:
+        if chunk:
+            out.write(encode_block(chunk, tables))
+    out.write(bytes(4))
+
+
+def iter_decode(f, tables):
+    for block_header, body in iter_blocks(f):
+        yield decode_block(block_header, body, tables)
+
+
+def compress(data, frequency_table=None):
+    """Сжимает байты в памяти: таблица частот и блоки по BLOCK_SIZE."""
+    if frequency_table is None:
+        counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+        frequency_table = {symbol: int(counts[symbol]) for symbol in np.flatnonzero(counts).tolist()}
+    freqs = quantize_frequencies(frequency_table)
+    f = io.BytesIO()
+    write_frequencies(f, freqs)
+    view = memoryview(data)
+    write_blocks(f, (view[i:i + BLOCK_SIZE] for i in range(0, len(data), BLOCK_SIZE)), build_tables(freqs))
+    return f.getvalue()
+
+
+def decompress(compressed):
+    f = io.BytesIO(compressed)
+    tables = build_tables(read_frequencies(f))
+    return b''.join(iter_decode(f, tables))
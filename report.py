@@ -0,0 +1,13 @@
+# Отчёт о сжатии для интерактивных режимов модулей. Модуль без зависимостей:
+# кодеки импортируют его, не подтягивая стенд benchmark со всеми кодеками.
+
+
+def print_report(original_size, compressed_size, seconds):
+    """Краткий отчёт о сжатии одного файла для интерактивных режимов модулей."""
+    compression_ratio = original_size / compressed_size
+    efficiency = max(0.0, (1 - compressed_size / original_size) * 100)
+    print(f"Исходный размер: {original_size} байт")
+    print(f"Закодированный размер: {compressed_size} байт")
+    print(f"Коэффициент сжатия: {compression_ratio:.2f}")
+    print(f"Относительная эффективность: {efficiency:.2f}%")
+    print(f"Время за которое выполнялась программа: {seconds:.4f} секунд")
@@ -1,6 +1,19 @@
+import io
 import os
 import sys
 
+import numpy as np
+
+from report import print_report
+
+# Признак двоичного формата; старый формат начинается с длины символа (1-4)
+BINARY_MAGIC = b'RLB\x01'
+# Более короткие повторы выгоднее оставить внутри литерала
+MIN_RUN = 3
+# Размер буфера чтения и примерный размер выдаваемых кусков распакованных данных
+BUFFER_SIZE = 1 << 20
+OUTPUT_CHUNK_SIZE = 1 << 20
+
 
 def rle_compress(data):
     """Функция сжатия с использованием алгоритма RLE"""
@@ -24,6 +37,218 @@ def rle_decompress(compressed):
     return ''.join(decompressed)
 
 
+def write_varint(out, value):
+    """Записывает целое число кусками по 7 бит, младшие первыми."""
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    """Читает varint начиная с pos; возвращает значение и новую позицию."""
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Число varint обрывается раньше конца данных")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+        # Длина до 2^64 занимает не больше 10 байтов; более длинное число - повреждение
+        if shift >= 70:
+            raise ValueError("Число varint длиннее 10 байтов")
+
+
+def find_runs(data, min_run=MIN_RUN):
+    """Начала и длины повторов не короче min_run, найденные векторным сравнением соседних байтов."""
+    values = np.frombuffer(data, dtype=np.uint8)
+    if not len(values):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(values)))
+    long_runs = lengths >= min_run
+    return starts[long_runs], lengths[long_runs]
+
+
+def rle_compress_bytes(data, min_run=MIN_RUN):
+    """Двоичное RLE: заголовок varint (длина << 1 | признак повтора).
+
+    За заголовком повтора идёт один байт значения, за заголовком
+    литерала — сами байты, поэтому неповторяющиеся участки почти не растут.
+    """
+    out = bytearray()
+    position = 0
+    for start, length in zip(*find_runs(data, min_run)):
+        start, length = int(start), int(length)
+        if start > position:
+            write_varint(out, (start - position) << 1)
+            out += data[position:start]
+        write_varint(out, length << 1 | 1)
+        out.append(data[start])
+        position = start + length
+    if position < len(data):
+        write_varint(out, (len(data) - position) << 1)
+        out += data[position:]
+    return bytes(out)
+
+
+def decompressed_size(compressed):
+    """Размер распакованных данных двоичного RLE по заголовкам записей, без распаковки."""
+    size = 0
+    pos = 0
+    while pos < len(compressed):
+        header, pos = read_varint(compressed, pos)
+        size += header >> 1
+        pos += 1 if header & 1 else header >> 1
+    if pos > len(compressed):
+        raise ValueError("Запись обрывается раньше конца данных")
+    return size
+
+
+def rle_decompress_bytes(compressed):
+    """Распаковка двоичного RLE в памяти.
+
+    Размер результата известен по заголовкам заранее: повреждённая длина
+    повтора даёт ошибку сразу, а не после того, как займёт всю память.
+    """
+    size = decompressed_size(compressed)
+    try:
+        out = bytearray(size)
+    except (MemoryError, OverflowError):
+        raise ValueError(f"Распакованные данные ({size} байт) не помещаются в память") from None
+    pos = 0
+    for chunk in iter_binary_chunks(io.BytesIO(compressed)):
+        out[pos:pos + len(chunk)] = chunk
+        pos += len(chunk)
+    return bytes(out)
+
+
+def fill_buffer(f, rest, needed, buffer_size):
+    """Дочитывает к остатку буфера блоки по buffer_size, пока в нём меньше needed байтов."""
+    while len(rest) < needed:
+        data = f.read(buffer_size)
+        if not data:
+            break
+        rest += data
+    return rest
+
+
+def iter_binary_chunks(f, buffer_size=BUFFER_SIZE, chunk_size=OUTPUT_CHUNK_SIZE):
+    """Генератор распакованных кусков двоичного RLE не больше chunk_size байтов.
+
+    Файл читается буфером по buffer_size байтов; длинные повторы и
+    литералы выдаются частями, так что память не зависит от их длины.
+    """
+    buffer = b''
+    pos = 0
+    out = bytearray()
+    while True:
+        # Заголовок varint занимает не больше 10 байтов
+        if len(buffer) - pos < 10:
+            buffer = fill_buffer(f, buffer[pos:], 10, buffer_size)
+            pos = 0
+            if not buffer:
+                break
+        header, pos = read_varint(buffer, pos)
+        length = header >> 1
+        if header & 1:
+            if pos >= len(buffer):
+                buffer = f.read(buffer_size)
+                pos = 0
+            value = buffer[pos:pos + 1]
+            if not value:
+                raise ValueError("Повтор обрывается без байта значения")
+            pos += 1
+            while length:
+                take = min(length, chunk_size - len(out))
+                out += value * take
+                length -= take
+                if len(out) >= chunk_size:
+                    yield bytes(out)
+                    out.clear()
+        else:
+            while length:
+                if pos >= len(buffer):
+                    buffer = f.read(buffer_size)
+                    pos = 0
+                    if not buffer:
+                        raise ValueError("Литерал обрывается раньше конца файла")
+                take = min(length, len(buffer) - pos, chunk_size - len(out))
+                out += buffer[pos:pos + take]
+                pos += take
+                length -= take
+                if len(out) >= chunk_size:
+                    yield bytes(out)
+                    out.clear()
+    if out:
+        yield bytes(out)
+
+
+def iter_runs(f, buffer_size=BUFFER_SIZE):
+    """Генератор пар (символ, количество) текстового формата, читающий файл большим буфером."""
+    buffer = b''
+    pos = 0
+    while True:
+        # Запись: длина символа (1 байт), сам символ (до 4 байтов), количество (4 байта)
+        if len(buffer) - pos < 9:
+            buffer = fill_buffer(f, buffer[pos:], 9, buffer_size)
+            pos = 0
+            if not buffer:
+                return
+        length = buffer[pos]
+        if not 1 <= length <= 4:
+            raise ValueError(f"Неверная длина символа в записи: {length}")
+        end = pos + 1 + length + 4
+        # Буфер дочитан до длины самой длинной записи: нехватка байтов - конец файла
+        if end > len(buffer):
+            raise ValueError("Запись обрывается раньше конца файла")
+        char = buffer[pos + 1:pos + 1 + length].decode('utf-8')  # Преобразуем байты в символ
+        count = int.from_bytes(buffer[pos + 1 + length:end], byteorder='big')
+        pos = end
+        yield char, count
+
+
+def iter_expanded(runs, chunk_size=OUTPUT_CHUNK_SIZE):
+    """Разворачивает повторы в строки примерно по chunk_size символов."""
+    parts = []
+    size = 0
+    for char, count in runs:
+        while count:
+            take = min(count, chunk_size - size)
+            parts.append(char * take)
+            size += take
+            count -= take
+            if size >= chunk_size:
+                yield ''.join(parts)
+                parts = []
+                size = 0
+    if parts:
+        yield ''.join(parts)
+
+
+def compress_file_binary(file_path):
+    """Функция сжатия файла в двоичном режиме RLE"""
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+
+        compressed_file_path = os.path.splitext(file_path)[0] + 'rle.bin'
+        with open(compressed_file_path, 'wb') as f:
+            f.write(BINARY_MAGIC)
+            f.write(rle_compress_bytes(data))
+
+        print(f"Файл сжат и сохранен в {compressed_file_path}")
+        return compressed_file_path
+
+    except Exception as e:
+        print(f"Ошибка при сжатии файла: {e}")
+        sys.exit(1)
+
+
 def compress_file(file_path):
     """Функция сжатия файла с использованием алгоритма RLE"""
     try:
@@ -52,26 +277,17 @@ def decompress_file(compressed_file_path, output_path):
     """Функция распаковки сжатого файла"""
     try:
         with open(compressed_file_path, 'rb') as f:
-            decompressed_data = []
-            while True:
-                length_byte = f.read(1)
-                if not length_byte:
-                    break
-                length = int.from_bytes(length_byte, byteorder='big')
-                char_bytes = f.read(length)
-                if not char_bytes:
-                    break
-                char = char_bytes.decode('utf-8')  # Преобразуем байты в символ
-                count_bytes = f.read(4)
-                if not count_bytes:
-                    break
-                count = int.from_bytes(count_bytes, byteorder='big')
-                decompressed_data.append(char * count)
-
-            decompressed_str = ''.join(decompressed_data)
-            output_path = os.path.splitext(output_path)[0] + '.txt'
-            with open(output_path, 'w', encoding='utf-8') as output_file:
-                output_file.write(decompressed_str)
+            if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+                # Двоичный режим: байты пишутся как есть, по указанному пути
+                with open(output_path, 'wb') as output_file:
+                    for chunk in iter_binary_chunks(f):
+                        output_file.write(chunk)
+            else:
+                f.seek(0)
+                output_path = os.path.splitext(output_path)[0] + '.txt'
+                with open(output_path, 'w', encoding='utf-8') as output_file:
+                    for chunk in iter_expanded(iter_runs(f)):
+                        output_file.write(chunk)
 
         print(f"Файл распакован и сохранен в {output_path}")
 
@@ -82,29 +298,17 @@ def decompress_file(compressed_file_path, output_path):
 
 if __name__ == "__main__":
     import time
+
     input_file_path = input("Введите путь к файлу для сжатия: ")
 
     if not os.path.exists(input_file_path):
         print("Файл не существует.")
         sys.exit(1)
     original_size = os.path.getsize(input_file_path)
-    start_time = time.time()
+    start_time = time.perf_counter()
     compressed_file_path = compress_file(input_file_path)
-    end_time = time.time() - start_time
-    compressed_size = os.path.getsize(compressed_file_path)
-    compression_ratio = original_size / compressed_size
-
-    if compressed_size >= original_size:
-        efficiency = 0
-    else:
-        efficiency = (1 - compressed_size / original_size) * 100
-    print(f"Исходный размер: {original_size} байт")
-    print(f"Закодированный размер: {compressed_size} байт")
-    print(f"Коэффициент сжатия: {compression_ratio:.2f}")
-    print(f"Относительная эффективность: {efficiency:.2f}%")
-    print(f"Время за которое выполнялась программа: {end_time} секунд")
-
-
+    end_time = time.perf_counter() - start_time
+    print_report(original_size, os.path.getsize(compressed_file_path), end_time)
 
     output_file_path = input("Введите путь для распаковки файла: ")
 
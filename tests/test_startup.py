@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import benchmark  # noqa: E402
+
+
+def imported_modules(*args):
+    """Модули, которые загружает команда cli.py (по выводу python -X importtime)."""
+    run = subprocess.run([sys.executable, "-X", "importtime", os.path.join(ROOT, "cli.py"), *args],
+                         input=benchmark.STARTUP_INPUT, capture_output=True, check=True)
+    return {name.split(".")[0] for _, name, _ in benchmark.import_rows(run.stderr.decode("utf-8", "replace"))}
+
+
+def test_codecs_load_lazily():
+    assert "numpy" not in imported_modules("--help")
+    for command in ("huffman", "rle", "fixed", "rs"):
+        modules = imported_modules(command)
+        assert not modules & {"qrcode", "PIL", "multiprocessing", "concurrent", "cProfile", "benchmark"}, command
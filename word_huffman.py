@@ -0,0 +1,155 @@
+import re
+from bisect import bisect_right
+
+import numpy as np
+
+import haffman
+import rle
+from report import print_report
+
+# Хаффман по словам: символы - слова и промежутки между ними, алфавит -
+# словарь текста (сотни тысяч символов). Длины кодов строятся по массивам
+# (haffman.huffman_code_lengths), коды канонические, поэтому в заголовке
+# хватает числа кодов каждой длины и словаря в каноническом порядке.
+#
+# Формат: MAGIC, число токенов (8 байт), наибольшая длина кода (1 байт),
+# число кодов каждой длины от 1 до наибольшей (по 4 байта), словарь
+# (длина слова в UTF-8 как varint и само слово) и упакованный поток кодов.
+
+MAGIC = b'HFW\x01'
+# Токены: слова и промежутки между ними, вместе они покрывают текст целиком
+TOKEN_PATTERN = re.compile(r'\w+|\W+')
+# Ограничение длины кода: упаковщик BitWriter пишет коды до 64 бит
+MAX_CODE_LENGTH = 32
+# Байтов потока за одну подкачку аккумулятора декодера
+REFILL_BYTES = 8
+
+
+def tokenize(text):
+    """Номера токенов текста и словарь в порядке первого появления."""
+    index = {}
+    ids = [index.setdefault(token, len(index)) for token in TOKEN_PATTERN.findall(text)]
+    return np.array(ids, dtype=np.int64), list(index)
+
+
+def compress(text, max_code_length=MAX_CODE_LENGTH):
+    """Сжимает строку кодом Хаффмана над словарём её токенов."""
+    ids, vocabulary = tokenize(text)
+    counts = np.bincount(ids, minlength=len(vocabulary))
+    lengths = haffman.limit_code_lengths(counts, haffman.huffman_code_lengths(counts), max_code_length)
+    codes = haffman.canonical_code_values(lengths)
+    order = np.lexsort((np.arange(len(lengths)), lengths))
+
+    header = bytearray(MAGIC)
+    header += len(ids).to_bytes(8, 'big')
+    max_length = int(lengths.max()) if len(lengths) else 0
+    header.append(max_length)
+    for count in np.bincount(lengths, minlength=max_length + 1)[1:].tolist():
+        header += count.to_bytes(4, 'big')
+    for i in order.tolist():
+        word = vocabulary[i].encode('utf-8')
+        rle.write_varint(header, len(word))
+        header += word
+    writer = haffman.BitWriter()
+    writer.write_indices(ids, codes, lengths)
+    return bytes(header) + writer.getvalue()
+
+
+def decompress(compressed):
+    """Восстанавливает строку, сжатую compress."""
+    if compressed[:len(MAGIC)] != MAGIC:
+        raise ValueError("Это не данные кода Хаффмана по словам")
+    pos = len(MAGIC)
+    token_count = int.from_bytes(compressed[pos:pos + 8], 'big')
+    max_length = compressed[pos + 8]
+    pos += 9
+    length_counts = [int.from_bytes(compressed[pos + 4 * i:pos + 4 * i + 4], 'big') for i in range(max_length)]
+    pos += 4 * max_length
+    vocabulary = []
+    for _ in range(sum(length_counts)):
+        size, pos = rle.read_varint(compressed, pos)
+        vocabulary.append(compressed[pos:pos + size].decode('utf-8'))
+        pos += size
+    if token_count and not vocabulary:
+        raise ValueError("Повреждённый заголовок: пустой словарь")
+    ids = decode_canonical(memoryview(compressed)[pos:], token_count, length_counts)
+    return ''.join(map(vocabulary.__getitem__, ids))
+
+
+def decode_canonical(payload, count, length_counts):
+    """Декодирует count канонических кодов; возвращает номера в каноническом порядке.
+
+    Таблицы поиска для словаря из сотен тысяч символов слишком велики,
+    поэтому длина кода находится двоичным поиском по границам: код длины L,
+    дополненный до наибольшей длины нулями, меньше границы своей длины и не
+    меньше границ всех более коротких.
+    """
+    max_length = len(length_counts)
+    limits, shifts, bases = [], [], []
+    code = 0
+    index = 0
+    for length, number in enumerate(length_counts, 1):
+        if number:
+            # bases: номер символа минус его код - для перехода от кода к номеру
+            limits.append((code + number) << (max_length - length))
+            shifts.append(max_length - length)
+            bases.append(index - code)
+        code = (code + number) << 1
+        index += number
+    lengths = [max_length - shift for shift in shifts]
+    mask = (1 << max_length) - 1
+    ids = [0] * count
+    acc = 0
+    acc_bits = 0
+    pos = 0
+    taken = 0
+    for i in range(count):
+        if acc_bits < max_length:
+            # За концом потока - нули: последнему коду окно может быть не нужно целиком
+            chunk = payload[pos:pos + REFILL_BYTES]
+            pos += REFILL_BYTES
+            tail = 8 * (REFILL_BYTES - len(chunk))
+            acc = ((acc & ((1 << acc_bits) - 1)) << 8 * REFILL_BYTES) | int.from_bytes(chunk, 'big') << tail
+            acc_bits += 8 * REFILL_BYTES
+        window = (acc >> (acc_bits - max_length)) & mask
+        j = bisect_right(limits, window)
+        if j == len(limits):
+            raise ValueError("Повреждённые сжатые данные")
+        ids[i] = bases[j] + (window >> shifts[j])
+        acc_bits -= lengths[j]
+        taken += lengths[j]
+    if taken > 8 * len(payload):
+        raise ValueError("Поток кодов обрывается")
+    return ids
+
+
+def compress_file(file_path):
+    """Сжимает текстовый файл (UTF-8) в file_path + '.hfw'."""
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        compressed = compress(f.read())
+    output_path = file_path + '.hfw'
+    with open(output_path, 'wb') as out:
+        out.write(compressed)
+    return output_path
+
+
+def decompress_file(file_path):
+    """Распаковывает .hfw-файл рядом с исходным именем."""
+    output_path = file_path[:-len('.hfw')] if file_path.endswith('.hfw') else file_path + '.out'
+    with open(file_path, 'rb') as f:
+        text = decompress(f.read())
+    with open(output_path, 'w', encoding='utf-8', newline='') as out:
+        out.write(text)
+    return output_path
+
+
+if __name__ == '__main__':
+    import time
+
+    with open('text.txt', 'r', encoding='utf-8') as f:
+        text = f.read()
+    start_time = time.perf_counter()
+    compressed = compress(text)
+    decoded_text = decompress(compressed)
+    end_time = time.perf_counter() - start_time
+    print_report(len(text.encode('utf-8')), len(compressed), end_time)